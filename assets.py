@@ -0,0 +1,159 @@
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pygame
+
+import atlas
+from settings import IMAGE_CACHE_SIZE, TEXT_CACHE_SIZE, ASSET_WORKERS, USE_ATLAS
+
+# кэш картинок: (путь, color_key, альфа) -> готовая поверхность
+_images = OrderedDict()
+# кэш нарезанных кадров: (путь, color_key, колонки, строки) -> кортеж кадров
+_frames = OrderedDict()
+# шрифты: (файл шрифта, размер) -> pygame.font.Font
+_fonts = {}
+# готовые надписи: (строка, цвет, сглаживание, файл шрифта, размер) -> поверхность
+_texts = OrderedDict()
+# атлас (atlas.py): (страницы после convert(), имя -> (страница, Rect)), None - еще не загружен
+_atlas = None
+
+
+def _cache_key(color_key):
+    # pygame.Color не хэшируется, поэтому храним цвет как кортеж:
+    if color_key is None or color_key == -1:
+        return color_key
+    return tuple(pygame.Color(color_key))
+
+
+def _remember(cache, key, value, limit=IMAGE_CACHE_SIZE):
+    cache[key] = value
+    if len(cache) > limit:
+        # выкидываем то, к чему дольше всего не обращались:
+        cache.popitem(last=False)
+    return value
+
+
+def load_image(name, color_key=-1):
+    fullname = os.path.join('data', name)
+    key = (fullname, _cache_key(color_key), color_key is None)
+    if key in _images:
+        _images.move_to_end(key)
+        return _images[key]
+
+    image = _from_atlas(name, color_key)
+    if image is not None:
+        return _remember(_images, key, image)
+
+    # если файл не существует, то выходим
+    if not os.path.isfile(fullname):
+        print(f"Файл с изображением '{fullname}' не найден")
+        sys.exit()
+    return _remember(_images, key, _prepare(pygame.image.load(fullname), color_key))
+
+
+def _prepare(image, color_key):
+    # convert() работает только в главном потоке и только после set_mode
+    if color_key is not None:
+        image = image.convert()
+        if color_key == -1:
+            color_key = image.get_at((0, 0))
+        image.set_colorkey(color_key)
+    else:
+        image = image.convert_alpha()
+    return image
+
+
+def _from_atlas(name, color_key):
+    # кусок страницы атласа вместо отдельного файла; картинки с альфой (color_key=None) - только из файлов
+    global _atlas
+    if not USE_ATLAS or color_key is None:
+        return None
+    _load_atlas()
+    place = _atlas[1].get(name)
+    if place is None:
+        return None
+    image = _atlas[0][place[0]].subsurface(place[1])
+    image.set_colorkey(image.get_at((0, 0)) if color_key == -1 else color_key)
+    return image
+
+
+def _load_atlas(progress=None):
+    # на свежей копии (data/cache не в git) атлас сначала собирается, см. atlas.load
+    global _atlas
+    if _atlas is None:
+        pages, places = atlas.load(progress)
+        _atlas = ([page.convert() for page in pages], places)
+
+
+def read_manifest(name='manifest.txt'):
+    # список картинок игры: по файлу на строку, после '#' - комментарий
+    with open(os.path.join('data', name), encoding='utf-8') as file:
+        lines = [line.split('#')[0].strip() for line in file]
+    return [line for line in lines if line]
+
+
+def missing_files(names):
+    return [name for name in names if not os.path.isfile(os.path.join('data', name))]
+
+
+def preload(names, progress=None, workers=ASSET_WORKERS):
+    # файлы разбираются параллельно в потоках (pygame отпускает GIL на время декодирования),
+    # а convert() и кэш - в главном потоке по мере готовности; progress(готово, всего) - после каждой картинки.
+    # картинки ложатся в кэш с color_key=-1, как их по умолчанию просит load_image
+    names = [name for name in names if (os.path.join('data', name), -1, False) not in _images]
+    if USE_ATLAS and progress:
+        # если атлас придется собирать, полоска идет по разбору его картинок
+        # (в той доле, которую в списке занимают png - они и лягут в атлас)
+        share = sum(name.endswith('.png') for name in names)
+        _load_atlas(lambda done, total: progress(done * share // total, len(names)))
+    # то, что есть в атласе, вырезается сразу; в потоки идут только отдельные файлы
+    files = []
+    for name in names:
+        image = _from_atlas(name, -1)
+        if image is None:
+            files.append(name)
+        else:
+            _remember(_images, (os.path.join('data', name), -1, False), image)
+    if progress and len(files) < len(names):
+        progress(len(names) - len(files), len(names))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = {pool.submit(pygame.image.load, os.path.join('data', name)): name for name in files}
+        for done, job in enumerate(as_completed(jobs), len(names) - len(files) + 1):
+            key = (os.path.join('data', jobs[job]), -1, False)
+            _remember(_images, key, _prepare(job.result(), -1))
+            if progress:
+                progress(done, len(names))
+
+
+def cut_sheet(sheet, columns, rows):
+    w, h = sheet.get_width() // columns, sheet.get_height() // rows
+    frames = []
+    for j in range(rows):
+        for i in range(columns):
+            frames.append(sheet.subsurface(pygame.Rect(w * i, h * j, w, h)))
+    return tuple(frames)
+
+
+def load_frames(name, columns, rows, color_key=-1):
+    key = (os.path.join('data', name), _cache_key(color_key), columns, rows)
+    if key in _frames:
+        _frames.move_to_end(key)
+        return _frames[key]
+    return _remember(_frames, key, cut_sheet(load_image(name, color_key), columns, rows))
+
+
+def get_font(face=None, size=25):
+    key = (face, size)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.Font(face, size)
+    return _fonts[key]
+
+
+def render_text(text, color=(255, 255, 255), antialias=True, face=None, size=25):
+    key = (text, tuple(pygame.Color(color)), antialias, face, size)
+    if key in _texts:
+        _texts.move_to_end(key)
+        return _texts[key]
+    return _remember(_texts, key, get_font(face, size).render(text, antialias, color), TEXT_CACHE_SIZE)
@@ -0,0 +1,105 @@
+# атлас: все png из data/ на одной или нескольких больших картинках + индекс, где какая лежит.
+# картинки в атласе уже без альфы, как после convert() в load_image, поэтому годятся только
+# для загрузки с color_key (по умолчанию так и есть); индекс помнит mtime и размер исходников,
+# и если они поменялись, атлас при запуске соберется заново
+#   python atlas.py   - собрать атлас заново
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pygame
+
+from settings import LEVEL_CACHE_DIR, ATLAS_SIZE, ASSET_WORKERS
+
+FOLDER = os.path.join('data', LEVEL_CACHE_DIR)
+INDEX = os.path.join(FOLDER, 'atlas.json')
+
+
+def sources():
+    return sorted(name for name in os.listdir('data') if name.endswith('.png'))
+
+
+def _stamp(name):
+    stat = os.stat(os.path.join('data', name))
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def pack(sizes, page_size=ATLAS_SIZE):
+    # полки: картинки от высоких к низким ставятся слева направо, полка кончилась - следующая ниже,
+    # страница кончилась - новая. sizes: имя -> (w, h); -> имя -> (страница, x, y).
+    # то, что больше страницы, в атлас не попадает
+    places = {}
+    page, x, y, shelf = 0, 0, 0, 0
+    for name in sorted(sizes, key=lambda name: (-sizes[name][1], name)):
+        w, h = sizes[name]
+        if w > page_size or h > page_size:
+            continue
+        if x + w > page_size:
+            x, y, shelf = 0, y + shelf, 0
+        if y + h > page_size:
+            page, x, y, shelf = page + 1, 0, 0, 0
+        places[name] = (page, x, y)
+        x += w
+        shelf = max(shelf, h)
+    return places
+
+
+def _decode(names, progress=None, workers=ASSET_WORKERS):
+    # картинки разбираются в потоках, как в assets.preload; progress(готово, всего) - после каждой
+    images = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = {pool.submit(pygame.image.load, os.path.join('data', name)): name for name in names}
+        for done, job in enumerate(as_completed(jobs), 1):
+            images[jobs[job]] = job.result()
+            if progress:
+                progress(done, len(names))
+    return images
+
+
+def build(page_size=ATLAS_SIZE, progress=None):
+    images = _decode(sources(), progress)
+    places = pack({name: image.get_size() for name, image in images.items()}, page_size)
+    # страница обрезается по тому, что на нее легло:
+    extents = {}
+    for name, (page, x, y) in places.items():
+        w, h = images[name].get_size()
+        right, bottom = extents.get(page, (0, 0))
+        extents[page] = (max(right, x + w), max(bottom, y + h))
+    pages = [pygame.Surface(extents[page]) for page in sorted(extents)]
+    index = {}
+    for name, (page, x, y) in places.items():
+        # MAX по черному фону - это просто копия цвета без смешивания по альфе
+        pages[page].blit(images[name], (x, y), special_flags=pygame.BLEND_RGB_MAX)
+        index[name] = [page, x, y, *images[name].get_size()]
+    os.makedirs(FOLDER, exist_ok=True)
+    files = []
+    for number, surface in enumerate(pages):
+        files.append(f'atlas{number}.png')
+        pygame.image.save(surface, os.path.join(FOLDER, files[-1]))
+    with open(INDEX, 'w') as file:
+        json.dump({'pages': files, 'images': index, 'stamps': {name: _stamp(name) for name in images}}, file)
+    return len(index), len(pages)
+
+
+def _read_index():
+    try:
+        with open(INDEX) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def load(progress=None):
+    # -> (страницы, как их отдал pygame.image.load; имя -> (страница, Rect));
+    # атлас собирается заново, если его нет или картинки в data/ поменялись, progress - как в build()
+    data = _read_index()
+    if data is None or data['stamps'] != {name: _stamp(name) for name in sources()}:
+        build(progress=progress)
+        data = _read_index()
+    pages = [pygame.image.load(os.path.join(FOLDER, name)) for name in data['pages']]
+    return pages, {name: (page, pygame.Rect(x, y, w, h)) for name, (page, x, y, w, h) in data['images'].items()}
+
+
+if __name__ == '__main__':
+    count, page_count = build()
+    print(f'{count} картинок на {page_count} стр. -> {INDEX}')
@@ -0,0 +1,143 @@
+# сколько пуль за кадр укладывается в 20 мс (FPS = 50): спрайты против BulletSystem
+#   python benchmarks/bench_bullets.py
+import math
+import os
+import random
+import sys
+from time import perf_counter
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+
+from settings import size, FPS
+from bullets import BulletSystem, ENEMY
+from collision import segment_cells, cells_under
+
+TILE = 50
+FRAMES = 60
+COUNTS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def load_level(filename):
+    with open(os.path.join('data', filename), 'r') as mapFile:
+        level_map = [line.strip() for line in mapFile]
+    max_width = max(map(len, level_map))
+    return [list(line.ljust(max_width, '.')) for line in level_map]
+
+
+def wall_mask(level):
+    # True там, где в level_map стена
+    return np.array([[cell == '#' for cell in row] for row in level], dtype=bool)
+
+
+def is_wall(level, cx, cy):
+    return 0 <= cy < len(level) and 0 <= cx < len(level[cy]) and level[cy][cx] == '#'
+
+
+class SpriteBullet(pygame.sprite.Sprite):
+    # пуля в том виде, в каком она была в main.py до BulletSystem
+    def __init__(self, group, x, y, tx, ty, speed, color):
+        super().__init__(group)
+        self.pos = [x, y]
+        self.dir = (tx - x, ty - y)
+        length = math.hypot(*self.dir)
+        if length == 0.0:
+            self.dir = (0, -1)
+        else:
+            self.dir = (self.dir[0] / length, self.dir[1] / length)
+        self.image = pygame.Surface((10, 10)).convert_alpha()
+        self.image.fill(color)
+        self.speed = speed
+        self.rect = self.image.get_rect(center=self.pos)
+        self.prev_pos = self.pos
+
+    def update(self):
+        self.prev_pos = self.pos
+        self.pos = [self.pos[0] + self.dir[0] * self.speed,
+                    self.pos[1] + self.dir[1] * self.speed]
+
+    def draw(self, surf):
+        self.rect = self.image.get_rect(center=self.pos)
+        surf.blit(self.image, self.rect)
+
+    def hits_wall(self, level):
+        for cx, cy in segment_cells(self.prev_pos[0], self.prev_pos[1], self.pos[0], self.pos[1], TILE):
+            if is_wall(level, cx, cy):
+                return True
+        return any(is_wall(level, cx, cy) for cx, cy in cells_under(self.rect, TILE))
+
+
+def random_shot(rnd, floor):
+    x, y = rnd.choice(floor)
+    x, y = x * TILE + TILE // 2, y * TILE + TILE // 2
+    angle = rnd.uniform(0, 2 * math.pi)
+    return x, y, x + math.cos(angle) * 100, y + math.sin(angle) * 100
+
+
+def run_sprites(screen, level, floor, count):
+    rnd = random.Random(count)
+    world = pygame.Rect(0, 0, len(level[0]) * TILE, len(level) * TILE)
+    group = pygame.sprite.Group()
+    times = []
+    for _ in range(FRAMES):
+        while len(group) < count:
+            SpriteBullet(group, *random_shot(rnd, floor), 5, (255, 255, 0))
+        tic = perf_counter()
+        for bullet in group:
+            bullet.draw(screen)
+        for bullet in group:
+            bullet.update()
+        for bullet in group.sprites():
+            if bullet.hits_wall(level) or not world.collidepoint(bullet.pos):
+                bullet.kill()
+        times.append(perf_counter() - tic)
+    return times
+
+
+def run_system(screen, level, floor, count):
+    rnd = random.Random(count)
+    bullets = BulletSystem(wall_mask(level), TILE, capacity=count)
+    times = []
+    for _ in range(FRAMES):
+        while len(bullets) < count:
+            bullets.spawn(*random_shot(rnd, floor), 5, ENEMY, (255, 255, 0))
+        tic = perf_counter()
+        bullets.draw(screen)
+        bullets.step()
+        bullets.cull()
+        times.append(perf_counter() - tic)
+    return times
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    level = load_level('map.map')
+    floor = [(x, y) for y, row in enumerate(level) for x, cell in enumerate(row) if cell == '.']
+    budget = 1000 / FPS
+    best = {'sprites': 0, 'numpy': 0}
+    print(f'бюджет кадра {budget:.1f} мс, {FRAMES} кадров на замер')
+    print(f'{"пуль":>8} {"спрайты, мс":>12} {"numpy, мс":>10}')
+    for count in COUNTS:
+        row = {}
+        for name, run in (('sprites', run_sprites), ('numpy', run_system)):
+            ms = median(run(screen, level, floor, count)) * 1000
+            row[name] = ms
+            if ms <= budget:
+                best[name] = count
+        print(f'{count:>8} {row["sprites"]:>12.2f} {row["numpy"]:>10.2f}')
+    print(f'пуль за кадр при {FPS} FPS: спрайты - {best["sprites"]}, numpy - {best["numpy"]}')
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# набор воспроизводимых замеров: каждый сценарий прогоняется без окна в отдельном процессе
+#   python benchmarks/run.py                 - прогнать все и сравнить с benchmarks/baselines.json
+#   python benchmarks/run.py bullets items   - только эти сценарии
+#   python benchmarks/run.py --save          - записать результаты как новые baselines
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from scenarios import SCENARIOS
+
+# какие числа сравниваем и что из них лучше - больше или меньше
+METRICS = (('ticks_per_s', 'тиков/с', True), ('p50_ms', 'p50, мс', False),
+           ('p99_ms', 'p99, мс', False), ('peak_mb', 'память, МБ', False))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # на Linux ru_maxrss в килобайтах, на macOS - в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_child(name, ticks, seed):
+    os.chdir(ROOT)
+    import settings
+    import headless
+    import levels
+    from controls import random_script
+
+    level, setup = SCENARIOS[name](seed)
+    # профилировщик должен помнить все тики прогона:
+    settings.PROFILE_HISTORY = ticks
+    try:
+        game = headless.run(level, ticks, random_script(ticks, seed), seed, setup=setup)
+    finally:
+        if os.path.isabs(level):
+            # временная карта сценария и ее скомпилированный файл в data/cache
+            for path in (level, levels.cache_path(level)):
+                if os.path.exists(path):
+                    os.remove(path)
+    # без окна один кадр - это один тик; ожидание часов не считаем
+    frames = [sum(row[:-1]) for row in game.profiler.history]
+    print(json.dumps({
+        'ticks': game.tick_count,
+        'ticks_per_s': game.tick_count / game.loop_time,
+        'p50_ms': percentile(frames, 50),
+        'p99_ms': percentile(frames, 99),
+        'peak_mb': peak_memory_mb(),
+    }))
+
+
+def run_scenario(name, ticks, seed):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name,
+                          '--ticks', str(ticks), '--seed', str(seed)],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f'сценарий {name} упал:\n{out.stderr}')
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    if result['ticks'] < ticks:
+        print(f'{name}: игра закончилась раньше, на тике {result["ticks"]} из {ticks}')
+    return result
+
+
+def compare(value, base, higher_is_better):
+    if value is None or not base:
+        return ''
+    change = (value - base) / base * 100
+    better = change > 0 if higher_is_better else change < 0
+    return f' ({change:+.0f}%{"" if abs(change) < 5 else " лучше" if better else " хуже"})'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры производительности на синтетических сценариях')
+    parser.add_argument('names', nargs='*', help='сценарии: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', action='store_true', help='сохранить результаты в baselines.json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.ticks, args.seed)
+        return
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as file:
+            baselines = json.load(file)
+    results = {}
+    for name in args.names or SCENARIOS:
+        result = run_scenario(name, args.ticks, args.seed)
+        results[name] = result
+        base = baselines.get(name, {})
+        line = [f'{name:<10}']
+        for key, title, higher in METRICS:
+            value = result[key]
+            shown = 'н/д' if value is None else f'{value:.1f}' if key != 'ticks_per_s' else f'{value:.0f}'
+            line.append(f'{title} {shown}{compare(value, base.get(key), higher)}')
+        print('  '.join(line))
+
+    if args.save:
+        baselines.update(results)
+        with open(BASELINES, 'w') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f'записано в {BASELINES}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# синтетические сценарии для benchmarks/run.py:
+# каждый сценарий по seed возвращает (карта, setup), setup - см. settings.HEADLESS_SETUP
+import math
+import os
+import random
+import tempfile
+
+from settings import WIDTH, HEIGHT
+
+
+def generate_map(width, height, turrets, seed, wall_density=0.08, turret_radius=None):
+    # прямоугольная карта в рамке из стен, турели на случайных свободных клетках;
+    # камера держит игрока там, где он стоит на карте, поэтому он ставится в середину первого экрана
+    rnd = random.Random(seed)
+    level = [['#' if x in (0, width - 1) or y in (0, height - 1) else '.' for x in range(width)]
+             for y in range(height)]
+    cx, cy = min(width // 2, WIDTH // 100), min(height // 2, HEIGHT // 100)
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            if abs(x - cx) + abs(y - cy) > 2 and rnd.random() < wall_density:
+                level[y][x] = '#'
+    level[cy][cx] = '@'
+    free = [(x, y) for y in range(1, height - 1) for x in range(1, width - 1)
+            if level[y][x] == '.' and (turret_radius is None or max(abs(x - cx), abs(y - cy)) <= turret_radius)]
+    for x, y in rnd.sample(free, min(turrets, len(free))):
+        level[y][x] = '&'
+    fd, path = tempfile.mkstemp(suffix='.map', prefix='bench_')
+    with os.fdopen(fd, 'w') as file:
+        file.write('\n'.join(''.join(row) for row in level))
+    return path
+
+
+def keep_bullets(count, seed):
+    # держит на уровне count пуль врагов, летящих в случайные стороны от игрока
+    def setup(game):
+        rnd = random.Random(seed)
+        enemy = game.ENEMY
+        speed = game.ENEMY_BULLET_SPEED / game.TICK_RATE
+
+        def tick():
+            x, y = game.player.rect.center
+            while len(game.bullets) < count:
+                angle = rnd.uniform(0, 2 * math.pi)
+                sx, sy = x + rnd.uniform(-300, 300), y + rnd.uniform(-300, 300)
+                if not game.bullets.spawn(sx, sy, sx + math.cos(angle), sy + math.sin(angle), speed, enemy, (255, 255, 0)):
+                    break
+        return tick
+    return setup
+
+
+def keep_alive(game):
+    # игрок бессмертный, иначе прогон под огнем закончится раньше времени
+    def tick():
+        game.player.hp = game.max_player_HP
+    return tick
+
+
+def drop_items(count, seed):
+    # раскладывает count предметов на полу вокруг игрока
+    def setup(game):
+        rnd = random.Random(seed)
+        px, py = game.player.pos
+        for _ in range(count):
+            x = (px + rnd.randint(-15, 15)) * game.tile_width
+            y = (py + rnd.randint(-15, 15)) * game.tile_height
+            game.drop_item(x, y, rnd.choice(("med_kit", "gun")))
+    return setup
+
+
+def both(*setups):
+    def setup(game):
+        ticks = [tick for tick in (one(game) for one in setups) if tick]
+
+        def tick():
+            for one in ticks:
+                one()
+        return tick if ticks else None
+    return setup
+
+
+SCENARIOS = {
+    # обычная карта и бот
+    'map': lambda seed: ('map3.map', None),
+    # большая карта: 300 x 300 клеток
+    'big_map': lambda seed: (generate_map(300, 300, 50, seed), keep_alive),
+    # 200 турелей вокруг игрока, почти все на экране
+    'turrets': lambda seed: (generate_map(40, 40, 200, seed, turret_radius=8), keep_alive),
+    # 2000 живых пуль все время
+    'bullets': lambda seed: ('map3.map', both(keep_bullets(2000, seed), keep_alive)),
+    # 500 выброшенных предметов
+    'items': lambda seed: ('map3.map', both(drop_items(500, seed), keep_alive)),
+    # все сразу
+    'stress': lambda seed: (generate_map(200, 200, 300, seed, turret_radius=12),
+                            both(keep_bullets(2000, seed), drop_items(300, seed), keep_alive)),
+}
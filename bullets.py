@@ -0,0 +1,201 @@
+import math
+
+import numpy as np
+import pygame
+
+from settings import MAX_BULLETS
+
+# чьи пули:
+PLAYER = 0
+ENEMY = 1
+
+BULLET_SIZE = 10
+
+
+class BulletSystem:
+    # все пули уровня лежат в массивах numpy, одна строка массивов - одна пуля.
+    # массивы выделяются один раз на capacity пуль: первые count строк - живые пули,
+    # остальные - свободные места, которые занимают новые выстрелы
+    fields = ('pos', 'prev', 'dir', 'speed', 'owner', 'color')
+
+    def __init__(self, walls, tile_size, capacity=MAX_BULLETS):
+        self.walls = walls
+        self.tile_size = tile_size
+        self.world = pygame.Rect(0, 0, walls.shape[1] * tile_size, walls.shape[0] * tile_size)
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.prev = np.zeros((capacity, 2))
+        self.dir = np.zeros((capacity, 2))
+        self.speed = np.zeros(capacity)
+        self.owner = np.zeros(capacity, dtype=np.uint8)
+        self.color = np.zeros(capacity, dtype=np.uint16)
+        # счетчики: сколько мест освободилось (пуля вылетела или попала) и сколько выстрелов не влезло
+        self.recycled = 0
+        self.dropped = 0
+        # где пули были нарисованы в прошлом кадре (для перерисовки кусками, см. render.py)
+        self.last_rects = []
+        # цвет -> номер, номер -> общая картинка для всех пуль этого цвета
+        self.colors = {}
+        self.images = []
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def free(self):
+        return self.capacity - self.count
+
+    def _color_index(self, color):
+        color = tuple(color)
+        if color not in self.colors:
+            image = pygame.Surface((BULLET_SIZE, BULLET_SIZE)).convert_alpha()
+            image.fill(color)
+            self.colors[color] = len(self.images)
+            self.images.append(image)
+        return self.colors[color]
+
+    # пуля из (x, y) в сторону точки (tx, ty); False, если свободных мест нет
+    def spawn(self, x, y, tx, ty, speed, owner, color=(255, 255, 255)):
+        if self.count == self.capacity:
+            self.dropped += 1
+            return False
+        dx, dy = tx - x, ty - y
+        length = math.hypot(dx, dy)
+        if length == 0.0:
+            dx, dy = 0, -1
+        else:
+            dx, dy = dx / length, dy / length
+        i = self.count
+        self.pos[i] = self.prev[i] = (x, y)
+        self.dir[i] = (dx, dy)
+        self.speed[i] = speed
+        self.owner[i] = owner
+        self.color[i] = self._color_index(color)
+        self.count += 1
+        return True
+
+    def step(self):
+        n = self.count
+        self.prev[:n] = self.pos[:n]
+        self.pos[:n] += self.dir[:n] * self.speed[:n, None]
+
+    def remove(self, dead):
+        keep = ~dead
+        n = int(keep.sum())
+        if n == self.count:
+            return
+        for name in self.fields:
+            array = getattr(self, name)
+            array[:n] = array[:self.count][keep]
+        self.recycled += self.count - n
+        self.count = n
+
+    # какие пули задели стену по пути prev -> pos: квадрат пули за тик заметает отрезок,
+    # поэтому отрезок центра пересекаем с клеткой-стеной, расширенной на пол-пули.
+    # клетки перебираем под прямоугольником, охватывающим путь, сразу для всех пуль
+    def _hits_walls(self, prev, pos):
+        size = self.tile_size
+        half = BULLET_SIZE / 2
+        h, w = self.walls.shape
+        walls = self.walls.ravel()
+        delta = pos - prev
+        # клетки за краем уровня стенами не считаются, так что охват сразу обрезаем по уровню
+        first = np.floor((np.minimum(prev, pos) - half) / size).astype(np.intp).clip(0, (w - 1, h - 1))
+        last = np.floor((np.maximum(prev, pos) + half) / size).astype(np.intp).clip(0, (w - 1, h - 1))
+        span_x, span_y = (last - first).max(axis=0) + 1
+        hit = np.zeros(len(pos), dtype=bool)
+        for i in range(span_x):
+            for j in range(span_y):
+                cx, cy = first[:, 0] + i, first[:, 1] + j
+                check = (cx <= last[:, 0]) & (cy <= last[:, 1])
+                check[check] = walls[cy[check] * w + cx[check]]
+                check &= ~hit
+                index = np.flatnonzero(check)
+                if len(index):
+                    low = np.stack((cx[index], cy[index]), axis=1) * size - half
+                    hit[index] = _crosses(prev[index], delta[index], low, low + size + BULLET_SIZE)
+        return hit
+
+    # убирает пули, вылетевшие за уровень или попавшие в стену
+    def cull(self):
+        n = self.count
+        if not n:
+            return
+        pos, prev = self.pos[:n], self.prev[:n]
+        world = self.world
+        dead = ~((pos[:, 0] >= world.left) & (pos[:, 0] < world.right) &
+                 (pos[:, 1] >= world.top) & (pos[:, 1] < world.bottom))
+        dead |= self._hits_walls(prev, pos)
+        self.remove(dead)
+
+    def rect(self, i):
+        x, y = np.floor(self.pos[i]).astype(int) - BULLET_SIZE // 2
+        return pygame.Rect(int(x), int(y), BULLET_SIZE, BULLET_SIZE)
+
+    # попадания пуль owner в спрайты из сетки grid (collision.SpatialHash):
+    # {спрайт: сколько пуль попало}, попавшие пули убираются
+    def collide(self, grid, owner):
+        n = self.count
+        if not n or not grid.cells:
+            return {}
+        mine = np.flatnonzero(self.owner[:n] == owner)
+        if not len(mine):
+            return {}
+        # грубая проверка: клетки под углами пули, в которых вообще что-то есть
+        size = grid.cell_size
+        topleft = np.floor(self.pos[mine]).astype(np.int64) - BULLET_SIZE // 2
+        occupied = np.array([_cell_key(cx, cy) for cx, cy in grid.cells], dtype=np.int64)
+        candidates = np.zeros(len(mine), dtype=bool)
+        for dx in (0, BULLET_SIZE - 1):
+            for dy in (0, BULLET_SIZE - 1):
+                cells = (topleft + (dx, dy)) // size
+                candidates |= np.isin(_cell_key(cells[:, 0], cells[:, 1]), occupied)
+        # точная проверка только для кандидатов
+        hits = {}
+        dead = np.zeros(n, dtype=bool)
+        for i in mine[candidates]:
+            rect = self.rect(i)
+            touched = [other for other in grid.query(rect) if rect.colliderect(other.rect)]
+            if touched:
+                target = min(touched, key=grid.order.get)
+                hits[target] = hits.get(target, 0) + 1
+                dead[i] = True
+        self.remove(dead)
+        return hits
+
+    # alpha - доля пути между прошлым и текущим тиком, на которой рисуем пулю
+    def _topleft(self, offset_x, offset_y, alpha=1.0):
+        n = self.count
+        pos = self.prev[:n] + (self.pos[:n] - self.prev[:n]) * alpha
+        return (np.floor(pos) - BULLET_SIZE // 2 + (offset_x, offset_y)).astype(int).tolist()
+
+    # прямоугольники пуль на экране
+    def screen_rects(self, offset_x=0, offset_y=0, alpha=1.0):
+        return [(x, y, BULLET_SIZE, BULLET_SIZE) for x, y in self._topleft(offset_x, offset_y, alpha)]
+
+    def draw(self, surf, offset_x=0, offset_y=0, alpha=1.0):
+        n = self.count
+        if not n:
+            return
+        topleft = self._topleft(offset_x, offset_y, alpha)
+        images = self.images
+        surf.blits([(images[c], p) for c, p in zip(self.color[:n].tolist(), topleft)], doreturn=False)
+
+
+def _crosses(start, delta, low, high):
+    # пересекает ли отрезок start -> start + delta прямоугольник (low, high), метод плит:
+    # по каждой оси находим, на каком отрезке t отрезок внутри полосы, и пересекаем эти отрезки
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (low - start) / delta
+        t2 = (high - start) / delta
+    still = delta == 0
+    inside = (low < start) & (start < high)
+    enter = np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+    leave = np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+    return np.maximum(enter.max(axis=1), 0.0) < np.minimum(leave.min(axis=1), 1.0)
+
+
+def _cell_key(cx, cy):
+    # пара номеров клетки -> одно число (клетки могут быть и с отрицательными номерами)
+    return (cx + (1 << 20)) * (1 << 21) + (cy + (1 << 20))
@@ -0,0 +1,121 @@
+import math
+
+from settings import LOS_CACHE_SIZE
+
+
+def cells_under(rect, size):
+    # клетки сетки размера size, которые задевает rect
+    for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            yield cx, cy
+
+
+def segment_cells(x0, y0, x1, y1, size):
+    # клетки, через которые проходит отрезок (x0, y0) -> (x1, y1), по порядку:
+    cx, cy = math.floor(x0 / size), math.floor(y0 / size)
+    ex, ey = math.floor(x1 / size), math.floor(y1 / size)
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    # через какую долю отрезка пересечем следующую вертикальную/горизонтальную линию сетки:
+    t_max_x = ((cx + (dx > 0)) * size - x0) / dx if dx else math.inf
+    t_max_y = ((cy + (dy > 0)) * size - y0) / dy if dy else math.inf
+    t_delta_x = size / abs(dx) if dx else math.inf
+    t_delta_y = size / abs(dy) if dy else math.inf
+    yield cx, cy
+    for _ in range(abs(ex - cx) + abs(ey - cy)):
+        if t_max_x < t_max_y:
+            cx += step_x
+            t_max_x += t_delta_x
+        else:
+            cy += step_y
+            t_max_y += t_delta_y
+        yield cx, cy
+
+
+class LineOfSight:
+    # видна ли одна клетка из другой: луч между центрами клеток по segment_cells не задевает стен.
+    # ответ запоминается для пары клеток; walls - массив (y, x), True - стена; после изменения стен нужен clear().
+    # сейчас стены уровня не меняются, так что игра clear() не вызывает
+    def __init__(self, walls, tile_size, max_size=LOS_CACHE_SIZE):
+        self.walls = walls
+        self.tile_size = tile_size
+        self.max_size = max_size
+        self.cache = {}
+        # ответы из кэша и посчитанные заново (строка отладки по F2 в main.py):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.cache.clear()
+
+    def visible(self, a, b):
+        key = (a[0], a[1], b[0], b[1])
+        seen = self.cache.get(key)
+        if seen is not None:
+            self.hits += 1
+            return seen
+        self.misses += 1
+        if len(self.cache) >= self.max_size:
+            self.cache.clear()
+        half = self.tile_size / 2
+        height, width = self.walls.shape
+        seen = True
+        for cx, cy in segment_cells(a[0] * self.tile_size + half, a[1] * self.tile_size + half,
+                                    b[0] * self.tile_size + half, b[1] * self.tile_size + half, self.tile_size):
+            if not (0 <= cx < width and 0 <= cy < height) or self.walls[cy, cx]:
+                seen = False
+                break
+        self.cache[key] = seen
+        return seen
+
+
+class SpatialHash:
+    # равномерная сетка: клетка -> список спрайтов, чьи rect ее задевают
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        # порядок добавления, чтобы попадания разбирались как в groupcollide:
+        self.order = {}
+
+    def clear(self):
+        self.cells.clear()
+        self.order.clear()
+
+    def insert(self, sprite):
+        self.order[sprite] = len(self.order)
+        for cell in cells_under(sprite.rect, self.cell_size):
+            self.cells.setdefault(cell, []).append(sprite)
+
+    def build(self, group):
+        self.clear()
+        for sprite in group:
+            self.insert(sprite)
+
+    # все спрайты из клеток, которые задевает rect (без повторов)
+    def query(self, rect):
+        found = {}
+        for cell in cells_under(rect, self.cell_size):
+            for sprite in self.cells.get(cell, ()):
+                found[sprite] = None
+        return found
+
+
+def spatial_collide(grid, group, dokill_grid, dokill_group):
+    # то же, что pygame.sprite.groupcollide(<спрайты из grid>, group, ...),
+    # но каждый спрайт group проверяется только с соседями по сетке
+    hits = {}
+    for sprite in group.sprites():
+        touched = [other for other in grid.query(sprite.rect) if sprite.rect.colliderect(other.rect)]
+        if not touched:
+            continue
+        if dokill_group:
+            # спрайт исчезает на первом же столкновении
+            touched = [min(touched, key=grid.order.get)]
+            sprite.kill()
+        for other in touched:
+            hits.setdefault(other, []).append(sprite)
+    if dokill_grid:
+        for other in hits:
+            other.kill()
+    return hits
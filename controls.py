@@ -0,0 +1,136 @@
+import random
+
+import pygame
+
+
+# какие события игра вообще разбирает, остальные SDL даже не кладет в очередь:
+USED_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+
+
+def block_unused_events(allowed=USED_EVENTS):
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(list(allowed))
+
+
+def coalesce_motion(events):
+    # все движения мыши за кадр -> одно, на месте последнего и с суммарным rel:
+    # сколько бы их ни пришло, обработчик движения отработает за кадр один раз
+    last = None
+    rel_x = rel_y = 0
+    for i, event in enumerate(events):
+        if event.type == pygame.MOUSEMOTION:
+            last = i
+            rel_x += event.rel[0]
+            rel_y += event.rel[1]
+    if last is None:
+        return events
+    motion = pygame.event.Event(pygame.MOUSEMOTION, pos=events[last].pos, rel=(rel_x, rel_y),
+                                buttons=events[last].buttons)
+    return [motion if i == last else event for i, event in enumerate(events)
+            if i == last or event.type != pygame.MOUSEMOTION]
+
+
+class LiveInput:
+    # ввод живого игрока: клавиатура и мышь.
+    # events() снимает все за кадр, mouse_pos() до следующего events() отдает положение мыши на тот момент
+    def __init__(self):
+        self.pos = (0, 0)
+
+    def events(self):
+        events = coalesce_motion(pygame.event.get())
+        self.pos = pygame.mouse.get_pos()
+        return events
+
+    def mouse_pos(self):
+        return self.pos
+
+
+class ScriptedInput:
+    # ввод по сценарию: список [номер кадра, действие, аргументы...]
+    #   ["key", "w"]            - нажать клавишу
+    #   ["mouse", x, y]         - передвинуть мышь
+    #   ["down", x, y], ["up", x, y], ["click", x, y] - кнопка мыши
+    #   ["quit"]                - закрыть игру
+    def __init__(self, script=()):
+        self.actions = {}
+        for frame, action, *args in script:
+            self.actions.setdefault(frame, []).append((action, args))
+        self.frame = 0
+        self.pos = (0, 0)
+
+    def _mouse(self, type, args):
+        self.pos = (args[0], args[1])
+        if type == pygame.MOUSEMOTION:
+            return pygame.event.Event(type, pos=self.pos, rel=(0, 0), buttons=(0, 0, 0))
+        return pygame.event.Event(type, pos=self.pos, button=1)
+
+    def events(self):
+        # настоящую очередь все равно разбираем, чтобы она не переполнялась:
+        pygame.event.clear()
+        events = []
+        for action, args in self.actions.get(self.frame, ()):
+            if action == "key":
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.key.key_code(args[0]), mod=0, unicode='', scancode=0))
+            elif action == "mouse":
+                events.append(self._mouse(pygame.MOUSEMOTION, args))
+            elif action == "down":
+                events.append(self._mouse(pygame.MOUSEBUTTONDOWN, args))
+            elif action == "up":
+                events.append(self._mouse(pygame.MOUSEBUTTONUP, args))
+            elif action == "click":
+                events.append(self._mouse(pygame.MOUSEBUTTONDOWN, args))
+                events.append(self._mouse(pygame.MOUSEBUTTONUP, args))
+            elif action == "quit":
+                events.append(pygame.event.Event(pygame.QUIT))
+        self.frame += 1
+        return events
+
+    def mouse_pos(self):
+        return self.pos
+
+
+class RecordingInput:
+    # пишет живой ввод в формате ScriptedInput; номер "кадра" - это номер тика,
+    # перед которым пришли события, поэтому повтор без окна (тик на проход цикла) совпадает с игрой
+    def __init__(self, source, tick):
+        self.source = source
+        self.tick = tick
+        self.script = []
+        self.pos = (0, 0)
+
+    def events(self):
+        # мышь запоминаем один раз на кадр: все обработчики кадра видят одно и то же положение
+        events = self.source.events()
+        self.pos = self.source.mouse_pos()
+        frame = self.tick()
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                # у клавиш без имени нет и обработчика в игре
+                if pygame.key.name(event.key):
+                    self.script.append([frame, "key", pygame.key.name(event.key)])
+            elif event.type == pygame.MOUSEMOTION:
+                self.script.append([frame, "mouse", *self.pos])
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                self.script.append([frame, "down", *self.pos])
+            elif event.type == pygame.MOUSEBUTTONUP:
+                self.script.append([frame, "up", *self.pos])
+            elif event.type == pygame.QUIT:
+                self.script.append([frame, "quit"])
+        return events
+
+    def mouse_pos(self):
+        return self.pos
+
+
+def random_script(frames, seed=0, width=800, height=800):
+    # бот: ходит в случайные стороны, водит мышью и стреляет
+    rnd = random.Random(seed)
+    script = []
+    for frame in range(frames):
+        if rnd.random() < 0.05:
+            script.append([frame, "key", rnd.choice("wasd")])
+        if rnd.random() < 0.1:
+            script.append([frame, "mouse", rnd.randrange(width), rnd.randrange(height)])
+        if rnd.random() < 0.03:
+            script.append([frame, "click", rnd.randrange(width), rnd.randrange(height)])
+    return script
@@ -0,0 +1,57 @@
+# прогон уровня без окна и без игрока, для баланса и проверки на регрессии:
+#   python headless.py --level map3.map --ticks 10000 --bot --seed 1
+#   python headless.py --script my_script.json
+import argparse
+import json
+import random
+import sys
+
+import settings
+from controls import random_script
+
+
+def run(level="map.map", ticks=1000, script=(), seed=0, render=False, profile_csv=None, setup=None):
+    # игра живет в глобальных переменных модуля main и прогоняется при импорте,
+    # повторный импорт вернул бы старую игру - второй прогон только в новом процессе
+    if 'main' in sys.modules:
+        raise RuntimeError('игра уже прогонялась в этом процессе, запустите новый процесс')
+    settings.HEADLESS = True
+    settings.HEADLESS_LEVEL = level
+    settings.HEADLESS_TICKS = ticks
+    settings.HEADLESS_SCRIPT = list(script)
+    settings.HEADLESS_RENDER = render
+    settings.PROFILE_CSV = profile_csv
+    settings.HEADLESS_SETUP = setup
+    random.seed(seed)
+    # main.py - это сама игра: импорт прогоняет уровень до конца
+    import main
+    return main
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогон уровня без окна")
+    parser.add_argument("--level", default="map.map", help="файл карты в data/")
+    parser.add_argument("--ticks", type=int, default=1000, help="сколько тиков логики прогнать")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--script", help="JSON со сценарием ввода: [[кадр, действие, аргументы...], ...]")
+    parser.add_argument("--bot", action="store_true", help="вместо сценария - случайный бот")
+    parser.add_argument("--render", action="store_true", help="рисовать кадры (медленнее)")
+    parser.add_argument("--profile-csv", help="записать время фаз каждого тика в CSV")
+    args = parser.parse_args()
+
+    script = []
+    if args.script:
+        with open(args.script) as file:
+            script = json.load(file)
+    elif args.bot:
+        script = random_script(args.ticks, args.seed)
+
+    game = run(args.level, args.ticks, script, args.seed, args.render, args.profile_csv)
+    print(f"тиков: {game.tick_count} за {game.loop_time:.2f} с "
+          f"({game.tick_count / max(game.loop_time, 1e-9):.0f} тиков/с)")
+    print(f"игрок: hp {game.player.hp}, броня {game.player.armor}, мана {game.player.mana}, клетка {game.player.pos}")
+    print(f"врагов осталось: {len(game.enemies_group)}, пуль в полете: {len(game.bullets)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+import pygame
+
+
+class Hud:
+    # показатели игрока собираются в одну поверхность, которая перерисовывается
+    # только когда меняется хотя бы одно значение из state
+    def __init__(self, rect, redraw):
+        self.rect = pygame.Rect(rect)
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA).convert_alpha()
+        # redraw(surf, dx, dy) рисует все элементы со сдвигом dx, dy
+        self.redraw = redraw
+        self.state = None
+        self.changed = False
+
+    def update(self, state):
+        self.changed = state != self.state
+        if self.changed:
+            self.state = state
+            self.surface.fill((0, 0, 0, 0))
+            self.redraw(self.surface, -self.rect.x, -self.rect.y)
+        return self.changed
+
+    def draw(self, surf):
+        surf.blit(self.surface, self.rect)
@@ -0,0 +1,160 @@
+# скомпилированные уровни: текстовая .map один раз превращается в двоичный файл
+# (заголовок, таблица появлений, сетка клеток uint8), дальше уровень читается через memmap.
+#   python levels.py            - скомпилировать все карты из data/
+#   python levels.py map3.map   - только эту
+import hashlib
+import os
+import struct
+import sys
+
+import numpy as np
+
+from settings import LEVEL_CACHE_DIR
+
+# коды клеток в сетке, индекс в TILE_CHARS - код:
+FLOOR, WALL, VOID = 0, 1, 2
+TILE_CHARS = '.#*'
+# кто появляется на уровне, индекс в SPAWN_CHARS - код; сама клетка под ним - пол:
+PLAYER, ENEMY = 0, 1
+SPAWN_CHARS = '@&'
+# пустая клетка в слое занятости Grid:
+EMPTY = 255
+
+MAGIC = b'SNLV'
+VERSION = 1
+# magic, версия, ширина, высота, число появлений, mtime_ns и размер исходника, sha1 исходника
+HEADER = struct.Struct('<4sHHHIqq20s')
+SPAWN = np.dtype([('kind', '<u2'), ('x', '<u2'), ('y', '<u2')])
+MAX_SIDE = 0xFFFF
+
+# байт символа -> код клетки; незнакомые символы непроходимы и не рисуются, как '*'
+_tiles = np.full(256, VOID, dtype=np.uint8)
+for _code, _char in enumerate(TILE_CHARS + SPAWN_CHARS):
+    _tiles[ord(_char)] = FLOOR if _char in SPAWN_CHARS else _code
+
+
+def compile_source(text):
+    # строки без пробелов по краям, дополненные полом до самой длинной (как раньше в load_level)
+    lines = [line.strip() for line in text.splitlines()]
+    width = max(map(len, lines))
+    # размеры и координаты появлений в файле - uint16
+    if width > MAX_SIDE or len(lines) > MAX_SIDE:
+        raise ValueError(f'карта {width}x{len(lines)} больше {MAX_SIDE} клеток по стороне')
+    # не-ASCII символ становится '?', то есть незнакомой клеткой, по одному байту на символ
+    raw = np.frombuffer(''.join(line.ljust(width, '.') for line in lines).encode('ascii', 'replace'),
+                        dtype=np.uint8).reshape(len(lines), width)
+    # появления в порядке обхода карты по строкам - в нем же раньше создавались враги
+    ys, xs = np.nonzero(np.isin(raw, [ord(char) for char in SPAWN_CHARS]))
+    spawns = np.empty(len(xs), dtype=SPAWN)
+    spawns['kind'] = [SPAWN_CHARS.index(chr(char)) for char in raw[ys, xs]]
+    spawns['x'] = xs
+    spawns['y'] = ys
+    return _tiles[raw], spawns
+
+
+def cache_path(source):
+    # одинаковые имена карт из разных папок не должны делить один файл:
+    tag = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join('data', LEVEL_CACHE_DIR, f'{name}-{tag}.lvl')
+
+
+def _read_header(path):
+    try:
+        with open(path, 'rb') as file:
+            header = HEADER.unpack(file.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return header if header[0] == MAGIC and header[1] == VERSION else None
+
+
+def _write(path, tiles, spawns, stat, digest):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    height, width = tiles.shape
+    # пишем во временный файл и подменяем, чтобы не оставить полузаписанный уровень
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, width, height, len(spawns), stat.st_mtime_ns, stat.st_size, digest))
+        file.write(spawns.tobytes())
+        file.write(np.ascontiguousarray(tiles).tobytes())
+    os.replace(path + '.tmp', path)
+
+
+def compile_level(filename):
+    # собирает (если нужно) двоичный файл для data/filename и возвращает путь к нему
+    source = os.path.join('data', filename)
+    path = cache_path(source)
+    stat = os.stat(source)
+    header = _read_header(path)
+    if header and header[5:7] == (stat.st_mtime_ns, stat.st_size):
+        return path
+    with open(source, 'rb') as file:
+        data = file.read()
+    digest = hashlib.sha1(data).digest()
+    if header and header[7] == digest:
+        # файл только "потрогали": уровень тот же, обновляем ключ в заголовке
+        with open(path, 'r+b') as file:
+            file.write(HEADER.pack(*header[:5], stat.st_mtime_ns, stat.st_size, digest))
+        return path
+    tiles, spawns = compile_source(data.decode('utf-8'))
+    _write(path, tiles, spawns, stat, digest)
+    return path
+
+
+def load_level(filename):
+    # -> (сетка кодов клеток height x width, таблица появлений)
+    # сетка открыта как копия при записи: менять ее можно, файл на диске не меняется
+    path = compile_level(filename)
+    _, _, width, height, count, _, _, _ = _read_header(path)
+    spawns = np.fromfile(path, dtype=SPAWN, count=count, offset=HEADER.size)
+    tiles = np.memmap(path, dtype=np.uint8, mode='c', offset=HEADER.size + count * SPAWN.itemsize,
+                      shape=(height, width))
+    return tiles, spawns
+
+
+class Grid:
+    # уровень в двух слоях numpy: tiles - что за клетка (FLOOR/WALL/VOID),
+    # occupancy - кто в ней стоит (PLAYER/ENEMY или EMPTY)
+    def __init__(self, tiles, spawns):
+        self.tiles = tiles
+        self.spawns = spawns
+        self.height, self.width = tiles.shape
+        self.occupancy = np.full(tiles.shape, EMPTY, dtype=np.uint8)
+        self.occupancy[spawns['y'], spawns['x']] = spawns['kind']
+
+    def inside(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def walkable(self, x, y):
+        # сюда можно шагнуть: клетка на уровне, это пол и она никем не занята
+        return self.inside(x, y) and self.tiles[y, x] == FLOOR and self.occupancy[y, x] == EMPTY
+
+    def occupant(self, x, y):
+        return self.occupancy[y, x]
+
+    def place(self, x, y, who):
+        self.occupancy[y, x] = who
+
+    def clear(self, x, y):
+        self.occupancy[y, x] = EMPTY
+
+    def move(self, x0, y0, x1, y1):
+        self.occupancy[y1, x1] = self.occupancy[y0, x0]
+        self.occupancy[y0, x0] = EMPTY
+
+    def walls(self):
+        return self.tiles == WALL
+
+    def free(self):
+        # маска клеток, куда можно шагнуть, сразу по всей карте
+        return (self.tiles == FLOOR) & (self.occupancy == EMPTY)
+
+    def find(self, who, x0=0, y0=0, x1=None, y1=None):
+        # координаты (x, y) клеток, где стоит who, по строкам; можно искать только в части карты
+        ys, xs = np.nonzero(self.occupancy[y0:y1, x0:x1] == who)
+        return np.column_stack((xs + x0, ys + y0))
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or sorted(name for name in os.listdir('data') if name.endswith('.map'))
+    for name in names:
+        print(name, '->', compile_level(name))
@@ -3,43 +3,30 @@ import random
 import sys
 from time import time
 import pygame
-import math
 from settings import *
 from items import *
-
-
-def load_image(name, color_key=-1):
-    fullname = os.path.join('data', name)
-    # если файл не существует, то выходим
-    if not os.path.isfile(fullname):
-        print(f"Файл с изображением '{fullname}' не найден")
-        sys.exit()
-    image = pygame.image.load(fullname)
-
-    if color_key is not None:
-        image = image.convert()
-        if color_key == -1:
-            color_key = image.get_at((0, 0))
-        image.set_colorkey(color_key)
-    else:
-        image = image.convert_alpha()
-    return image
+from assets import load_image, load_frames, get_font, render_text, read_manifest, missing_files, preload
+from tilemap import TileLayer
+from streaming import ChunkStreamer
+from pathfinding import FlowField
+from scheduler import AiScheduler
+from collision import SpatialHash, LineOfSight, spatial_collide
+from bullets import BulletSystem, PLAYER, ENEMY
+from hud import Hud
+from render import DirtyTracker
+from controls import LiveInput, ScriptedInput, RecordingInput, block_unused_events
+from profiler import Profiler
+import levels
+import replay
 
 
 def load_level(filename):
-    filename = "data/" + filename
-    # читаем уровень, убирая символы перевода строки
-    with open(filename, 'r') as mapFile:
-        level_map = [line.strip() for line in mapFile]
+    # уровень читается из скомпилированного файла (levels.py), .map разбирается только после изменений;
+    # абсолютный путь (например, к сгенерированной карте) тоже подходит
+    return levels.Grid(*levels.load_level(filename))
 
-    # и подсчитываем максимальную длину
-    max_width = max(map(len, level_map))
 
-    # дополняем каждую строку пустыми клетками ('.')
-    return list(map(lambda x: list(x.ljust(max_width, '.')), level_map))
-
-
-level_map = load_level("map.map")
+level_grid = load_level("map.map")
 
 
 def terminate():
@@ -47,21 +34,6 @@ def terminate():
     sys.exit()
 
 
-class Tile(pygame.sprite.Sprite):
-    def __init__(self, tile_type, pos_x, pos_y):
-
-        # проверяем на "твердый ли" объект:
-        if tile_type != "wall":
-            super().__init__(tiles_group)
-        else:
-            super().__init__(solid_objects)
-        self.image = tile_images[tile_type]
-        self.pos_x = pos_x
-        self.pos_y = pos_y
-        self.rect = self.image.get_rect().move(
-            tile_width * pos_x, tile_height * pos_y)
-
-
 class Item(pygame.sprite.Sprite):
     def __init__(self, type, x, y, inventory_icon, inventory_place=-1):
         self.inventory_pos = inventory_place
@@ -99,72 +71,54 @@ class Inventory(pygame.sprite.Sprite):
 class Text:
     def __init__(self, x, y, text, color=(255, 255, 255)):
         self.color = color
-        f1 = pygame.font.Font(None, 25)
-        self.text = f1.render(f'{text}', True, self.color)
+        self.string = None
+        self.set_text(text)
         self.pos_x = x
         self.pos_y = y
 
-    def draw(self, surf):
-        surf.blit(self.text, (self.pos_x, self.pos_y))
-
-
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, type, speed, color=(255, 255, 255)):
-        pygame.sprite.Sprite.__init__(self)
-        self.pos = [x, y]
-        if type == "player":
-            super().__init__(player_bullets)
-            mx, my = pygame.mouse.get_pos()
-        elif type == "enemy":
-            super().__init__(enemy_bullets)
-            mx, my = player.rect.centerx + random.randint(-30, 30), player.rect.top + 30 + random.randint(-30, 30)
-        self.color = color
-        self.dir = (mx - x, my - y)
-        length = math.hypot(*self.dir)
-        if length == 0.0:
-            self.dir = (0, -1)
-        else:
-            self.dir = (self.dir[0]/length, self.dir[1]/length)
-        angle = math.degrees(math.atan2(-self.dir[1], self.dir[0]))
+    # надпись перерисовывается (и то через кэш) только если строка поменялась
+    def set_text(self, text):
+        text = f'{text}'
+        if text != self.string:
+            self.string = text
+            self.text = render_text(text, self.color)
 
-        self.image = pygame.Surface((10, 10)).convert_alpha()
-        self.image.fill(color)
-        self.speed = speed
-        self.rect = self.image.get_rect(center=self.pos)
-
-    def update(self):
-        self.pos = [self.pos[0]+self.dir[0]*self.speed,
-                    self.pos[1]+self.dir[1]*self.speed]
-
-    def draw(self, surf):
-        self.rect = self.image.get_rect(center=self.pos)
-        screen.blit(self.image, self.rect)
+    def draw(self, surf, dx=0, dy=0):
+        surf.blit(self.text, (self.pos_x + dx, self.pos_y + dy))
 
 
 class AnimatedSprite(pygame.sprite.Sprite):
-    def __init__(self, sheet, columns, rows, x, y, n_frames=1):
+    def __init__(self, frames, x, y, n_frames=1):
         super().__init__(animation_group)
-        self.frames = []
-        self.cut_sheet(sheet, columns, rows)
+        # кадры приходят уже нарезанными из кэша (см. assets.load_frames):
+        self.frames = frames
         self.cur_frame = 0
         self.image = self.frames[self.cur_frame]
-        self.rect = self.rect.move(x, y)
+        self.rect = self.image.get_rect().move(x, y)
         self.n_frames = n_frames
 
-    def cut_sheet(self, sheet, columns, rows):
-        self.rect = pygame.Rect(0, 0, sheet.get_width() // columns,
-                                sheet.get_height() // rows)
-        for j in range(rows):
-            for i in range(columns):
-                frame_location = (self.rect.w * i, self.rect.h * j)
-                self.frames.append(sheet.subsurface(pygame.Rect(
-                    frame_location, self.rect.size)))
-
     def update(self):
         self.cur_frame = (self.cur_frame + 1) % (len(self.frames) * self.n_frames)
         self.image = self.frames[self.cur_frame // self.n_frames]
 
 
+class DirectionalAnimation(AnimatedSprite):
+    # анимация с отдельными кадрами на каждую сторону (u/d/l/r): создается один раз,
+    # поворот только меняет набор кадров, а счетчик кадров идет дальше
+    def __init__(self, frame_sets, side, x, y, n_frames=1):
+        self.frame_sets = frame_sets
+        self.side = side
+        super().__init__(frame_sets[side], x, y, n_frames)
+
+    def turn(self, side):
+        if side == self.side:
+            return
+        self.side = side
+        self.frames = self.frame_sets[side]
+        self.cur_frame %= len(self.frames) * self.n_frames
+        self.image = self.frames[self.cur_frame // self.n_frames]
+
+
 class Player(pygame.sprite.Sprite):
     def __init__(self, pos_x, pos_y, hp, armor, mana, inventory=INVENTORY):
         super().__init__(player_group)
@@ -179,44 +133,25 @@ class Player(pygame.sprite.Sprite):
             tile_width * pos_x, tile_height * pos_y)
         self.pos = (pos_x, pos_y)
         self.start_pos = (pos_x, pos_y)
-        self.razn_x = 0
-        self.razn_y = 0
         self.inventory_list = inventory
+        # все кадры всех сторон нарезаются один раз:
+        self.animation = DirectionalAnimation({side: load_frames(f"m_{side}.png", 10, 1) for side in "udlr"},
+                                              "r", self.rect.x, self.rect.y, ANIMATION_TICKS)
 
     def move(self, x, y):
-        camera.dx -= tile_width * (x - self.pos[0])
-        camera.dy -= tile_height * (y - self.pos[1])
-        level_map[self.pos[1]][self.pos[0]] = "."
+        level_grid.move(self.pos[0], self.pos[1], x, y)
         self.pos = (x, y)
-        level_map[self.pos[1]][self.pos[0]] = "@"
-
-        camera.x += camera.dx
-        camera.y += camera.dy
-
-        # смещение спрайтов
-        for sprite in tiles_group:
-            camera.apply(sprite)
-        for sprite in solid_objects:
-            camera.apply(sprite)
-        for sprite in enemies_group:
-            sprite.type = "player_move"
-            camera.apply(sprite)
-        for sprite in player_bullets:
-            camera.apply(sprite)
-        for sprite in enemy_bullets:
-            camera.apply(sprite)
-        for sprite in basic_item_group:
-            camera.apply(sprite)
+
+        # все объекты живут в координатах мира, сдвигается только камера:
+        self.rect.topleft = (tile_width * x, tile_height * y)
+        self.animation.rect.topleft = self.rect.topleft
+        camera.update(self)
 
     def shoot(self, storona):
         if self.mana > 3:
             self.mana -= 4
-            bullet = Bullet(self.rect.centerx, self.rect.top + 30, "player", 7, (255, 0, 0))
-            player_bullets.add(bullet)
-            all_sprites.add(bullet)
-
-    def update_image(self, name_image):
-        AnimatedSprite(load_image(name_image), 10, 1, (player.pos[0] - self.razn_x) * 50, (player.pos[1] - self.razn_y) * 50, 5)
+            mx, my = camera.to_world(controls.mouse_pos())
+            bullets.spawn(self.rect.centerx, self.rect.top + 30, mx, my, PLAYER_BULLET_SPEED / TICK_RATE, PLAYER, (255, 0, 0))
 
 
 class Status:
@@ -236,9 +171,9 @@ class Status:
         self.rect = self.image.get_rect(topleft=self.pos)
         status_list.append(self)
 
-    def draw(self, surf):
+    def draw(self, surf, dx=0, dy=0):
         self.rect = self.image.get_rect(topleft=self.pos)
-        surf.blit(self.image, self.rect)
+        surf.blit(self.image, self.rect.move(dx, dy))
 
 
 class Enemy(pygame.sprite.Sprite):
@@ -251,71 +186,60 @@ class Enemy(pygame.sprite.Sprite):
         self.rect = self.image.get_rect().move(
             tile_width * self.pos_x, tile_height * self.pos_y)
         self.pos = [self.pos_x, self.pos_y]
-        self.razn_x = 0
-        self.razn_y = 0
-        self.type = 0
-        self.camera_pos = [self.pos[0], self.pos[1]]
+        # тики следующего выстрела и следующего шага, см. enemy_think:
+        self.next_shot = 0
+        self.next_move = 0
+        # первые решения врагов разносятся по разным тикам:
+        ai.add(self, 1 + len(ai) % round(ENEMY_FIRE_TIME * TICK_RATE))
 
     def brain(self):
-        storona = random.randint(0, 3)
-        if storona == 0:
-            storona = "right"
-        elif storona == 1:
-            storona = "left"
-        elif storona == 2:
-            storona = "down"
-        elif storona == 3:
-            storona = "up"
-        return storona
+        # куда шагнуть к игроку по общему полю расстояний flow_field, None - стоять на месте
+        if flow_field.distance(*self.pos) <= ENEMY_STOP_DISTANCE:
+            return None
+        cell = flow_field.step(*self.pos)
+        if cell is None:
+            return None
+        return {(1, 0): "right", (-1, 0): "left", (0, 1): "down", (0, -1): "up"}[
+            (cell[0] - self.pos[0], cell[1] - self.pos[1])]
 
     def move(self, x, y):
-        level_map[self.pos[1]][self.pos[0]] = "."
-        #print(level_map[self.pos[1]][self.pos[0]])
-        x2, y2 = self.rect.x, self.rect.y
-        enem_pos = (self.pos[0] - x, self.pos[1] - y)
+        level_grid.move(self.pos[0], self.pos[1], x, y)
         self.pos_x = x
         self.pos_y = y
-        self.rect = self.image.get_rect().move(self.rect.x + enem_pos[0] * 50, self.rect.y + enem_pos[1] * 50)
+        self.rect = self.image.get_rect().move(tile_width * x, tile_height * y)
         self.pos = [self.pos_x, self.pos_y]
-        #print(level_map[self.pos[1]][self.pos[0]])
-        level_map[self.pos[1]][self.pos[0]] = "&"
-        #print(level_map[self.pos[1]][self.pos[0]])
 
     def shoot(self):
-        bullet = Bullet(self.rect.centerx, self.rect.top + 30, "enemy", 5, (255, 255, 0))
-        all_sprites.add(bullet)
-        enemy_bullets.add(bullet)
+        mx, my = player.rect.centerx + random.randint(-30, 30), player.rect.top + 30 + random.randint(-30, 30)
+        bullets.spawn(self.rect.centerx, self.rect.top + 30, mx, my, ENEMY_BULLET_SPEED / TICK_RATE, ENEMY, (255, 255, 0))
 
 
 class Camera:
-    # зададим начальный сдвиг камеры
+    # мир стоит на месте, камера хранит один сдвиг мира относительно экрана
     def __init__(self):
-        self.dx = 0
-        self.dy = 0
         self.x = 0
         self.y = 0
 
-    # сдвинуть объект obj на смещение камеры
-    def apply(self, obj):
-        # т.к класс пуль и врагов по итогу немного отличается, приходится осуществлять проверку:
-        if isinstance(obj, (Bullet)):
-            obj.pos[0] += self.dx
-            obj.pos[1] += self.dy
-        #elif isinstance(obj, (Enemy)):
-        #    if obj.type == "enemy_move":
-        #        obj.rect.x += self.x
-        #        obj.rect.y += self.y
-        #    elif obj.type == "player_move":
-        #        obj.rect.x += self.dx
-        #        obj.rect.y += self.dy
-        else:
-            obj.rect.x += self.dx
-            obj.rect.y += self.dy
+    # прямоугольник rect (в координатах мира) на экране
+    def apply(self, rect):
+        return rect.move(self.x, self.y)
 
-    # позиционировать камеру на объекте target
+    # точка экрана (например, мышь) в координатах мира
+    def to_world(self, pos):
+        return pos[0] - self.x, pos[1] - self.y
+
+    # видимая часть мира
+    def view(self):
+        return screen.get_rect().move(-self.x, -self.y)
+
+    def draw(self, group, surf):
+        for sprite in group:
+            surf.blit(sprite.image, self.apply(sprite.rect))
+
+    # позиционировать камеру на объекте target: он остается там, где появился на экране
     def update(self, target):
-        self.dx = 0
-        self.dy = 0
+        self.x = tile_width * (target.start_pos[0] - target.pos[0])
+        self.y = tile_height * (target.start_pos[1] - target.pos[1])
 
 
 class Sprite_Mouse_Location(pygame.sprite.Sprite):
@@ -326,23 +250,14 @@ class Sprite_Mouse_Location(pygame.sprite.Sprite):
         self.rect = pygame.Rect(0, 0, 1, 1)
 
 
-def generate_level(level):
-    new_player, x, y = None, None, None
-    for y in range(len(level)):
-        for x in range(len(level[y])):
-            # не знаю как оформить проверку на то, является ли объект твердым, пускай будет пока тут:
-            if level[y][x] == '.':
-                Tile('empty', x, y)
-            elif level[y][x] == '#':
-                Tile('wall', x, y)
-            elif level[y][x] == '@':
-                Tile('empty', x, y)
-                new_player = Player(x, y, max_player_HP, max_player_AR, max_player_AM, INVENTORY)
-            elif level[y][x] == "&":
-                Tile('empty', x, y)
-                new_enemy = Enemy(x, y)
-    # вернем игрока, а также размер поля в клетках
-    return new_player, x, y
+def generate_level(grid):
+    new_player = None
+    # земля и стены рисуются кусками через TileLayer, в пули стены проверяются по grid.walls(),
+    # враги создаются в load_chunk, когда камера подходит к ним; здесь нужен только игрок:
+    for kind, x, y in grid.spawns.tolist():
+        if kind == levels.PLAYER:
+            new_player = Player(x, y, max_player_HP, max_player_AR, max_player_AM, INVENTORY)
+    return new_player
 
 
 def move(object, movement):
@@ -351,41 +266,58 @@ def move(object, movement):
         #print(movement)
         pass
     if movement == "up":
-        if y > 0 and level_map[y - 1][x] == ".":
+        if level_grid.walkable(x, y - 1):
             object.move(x, y - 1)
-            if isinstance(object, (Player)):
-                object.razn_y -= 1
     elif movement == "down":
-        if y < max_y and level_map[y + 1][x] == ".":
+        if level_grid.walkable(x, y + 1):
             object.move(x, y + 1)
-            if isinstance(object, (Player)):
-                object.razn_y += 1
     elif movement == "left":
-        if x > 0 and level_map[y][x - 1] == ".":
+        if level_grid.walkable(x - 1, y):
             object.move(x - 1, y)
-            if isinstance(object, (Player)):
-                object.razn_x -= 1
     elif movement == "right":
-        if x < max_x and level_map[y][x + 1] == ".":
+        if level_grid.walkable(x + 1, y):
             object.move(x + 1, y)
-            if isinstance(object, (Player)):
-                object.razn_x += 1
 
 
+if HEADLESS:
+    # без окна: SDL рисует в память
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
 pygame.init()
 pygame.display.set_caption("Soul Night")
 screen = pygame.display.set_mode(size)
 clock = pygame.time.Clock()
-my_time = 0
-next_time = 0
+# лишние события (ввод текста, окно и т.п.) не нужны ни в меню, ни в игре:
+block_unused_events()
 inventory_view = False
+debug_view = False
+# откуда берутся нажатия и положение мыши:
+if HEADLESS:
+    controls = ScriptedInput(HEADLESS_SCRIPT)
+elif RECORD_PATH:
+    # для повтора запоминаем seed: от него зависят разброс пуль и поведение врагов
+    record_seed = random.randrange(2 ** 32) if RECORD_SEED is None else RECORD_SEED
+    random.seed(record_seed)
+    controls = RecordingInput(LiveInput(), lambda: tick_count)
+else:
+    controls = LiveInput()
+
+
+def show_loading(done, total):
+    # полоска загрузки картинок перед заставкой
+    bar = pygame.Rect(200, HEIGHT // 2 - 10, 400, 20)
+    screen.fill(pygame.Color("black"))
+    pygame.draw.rect(screen, pygame.Color("white"), bar, 2)
+    pygame.draw.rect(screen, pygame.Color("green"), (bar.x + 4, bar.y + 4, (bar.w - 8) * done // total, bar.h - 8))
+    screen.blit(render_text(f'Загрузка: {done} из {total}'), (bar.x, bar.bottom + 10))
+    pygame.display.flip()
+    # окно не должно "зависнуть", пока грузимся:
+    pygame.event.pump()
 
 
 def start_screen():
-    global level_map
-    fon = pygame.transform.scale(load_image('fon3.jpg'), (WIDTH, HEIGHT))
+    global level_grid, level_name
+    fon = pygame.transform.scale(load_image('fon.jpg'), (WIDTH, HEIGHT))
     screen.blit(fon, (0, 0))
-    font = pygame.font.Font(None, 30)
     text_coord = 50
     cube1_x, cube1_y = 200, 100
     cube2_x, cube2_y = 200, 300
@@ -421,7 +353,7 @@ def start_screen():
                         ((cube_3.x, cube_3.y), (cube_3.x, cube_3.y + line2), (cube_3.x + line1, cube_3.y + line2),
                          (cube_3.x + line1, cube_3.y)))
 
-    f1 = pygame.font.Font(None, 36)
+    f1 = get_font(None, 36)
     text = f1.render(f'Легкий', True, (255, 255, 255))
     text_2 = f1.render(f'Нормальный', True, (255, 255, 255))
     text_3 = f1.render(f'Сложный', True, (255, 255, 255))
@@ -438,28 +370,38 @@ def start_screen():
                     event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = pygame.mouse.get_pos()
                 if x >= cube.x and x <= cube.x + line1 and y >= cube.y and y <= cube.y + line2:
-                    level_map = load_level("map.map")
+                    level_name = "map.map"
+                    level_grid = load_level(level_name)
                     return
                 elif x >= cube_2.x and x <= cube_2.x + line1 and y >= cube_2.y and y <= cube_2.y + line2:
-                    level_map = load_level("map2.map")
+                    level_name = "map2.map"
+                    level_grid = load_level(level_name)
                     return
                 elif x >= cube_3.x and x <= cube_3.x + line1 and y >= cube_3.y and y <= cube_3.y + line2:
-                    level_map = load_level("map3.map")
+                    level_name = "map3.map"
+                    level_grid = load_level(level_name)
                     return
         pygame.display.flip()
         clock.tick(FPS)
 
-start_screen()
+# все картинки из data/manifest.txt грузятся сразу и параллельно; если каких-то нет - говорим обо всех сразу
+asset_names = read_manifest()
+missing = missing_files(asset_names)
+if missing:
+    print("Не найдены файлы:", ", ".join(os.path.join("data", name) for name in missing))
+    terminate()
+preload(asset_names, None if HEADLESS else show_loading)
+
+if HEADLESS:
+    level_name = HEADLESS_LEVEL
+    level_grid = load_level(level_name)
+else:
+    start_screen()
 
 # список статусов:
 status_list = []
 
-tiles_group = pygame.sprite.Group()
 player_group = pygame.sprite.Group()
-player_bullets = pygame.sprite.Group()
-enemy_bullets = pygame.sprite.Group()
-all_sprites = pygame.sprite.Group()
-solid_objects = pygame.sprite.Group()
 enemies_group = pygame.sprite.Group()
 animation_group = pygame.sprite.Group()
 inventory_group = pygame.sprite.Group()
@@ -467,8 +409,6 @@ inventory_item_group = pygame.sprite.Group()
 basic_item_group = pygame.sprite.Group()
 mouse_group = pygame.sprite.Group()
 
-collision_list = [(solid_objects, player_bullets, False, True), (enemies_group, player_bullets, True, True), (player_group, enemy_bullets, False, True),
-                  (basic_item_group, player_group, False, False), (solid_objects, enemy_bullets, False, True)]
 
 tile_images = {
     'wall': load_image('box.png'),
@@ -476,15 +416,65 @@ tile_images = {
 }
 
 player_image = load_image('r.png')
-enemies_image = load_image("turel.png")
+enemies_image = load_image("enemy.png")
 
 tile_width = tile_height = 50
 
 camera = Camera()
-#level_map = load_level("map.map")
-player, max_x, max_y = generate_level(level_map)
+player = generate_level(level_grid)
+tile_layer = TileLayer(level_grid.tiles, {levels.FLOOR: tile_images['empty'], levels.WALL: tile_images['wall']}, tile_width)
+
+# сетки для столкновений, раскладываются заново перед проверкой в каждом кадре:
+collision_grids = {group: SpatialHash(tile_width) for group in (enemies_group, player_group, basic_item_group)}
+
+# все пули (и игрока, и врагов) живут в массивах numpy:
+bullets = BulletSystem(level_grid.walls(), tile_width)
+# враги стреляют, только если видят игрока сквозь те же стены, в которых гаснут пули:
+sight = LineOfSight(bullets.walls, tile_width)
+
+# враги и предметы на полу есть только в загруженных кусках карты; спящие враги - это их клетки
+# в level_grid.occupancy, спящие предметы - здесь: кусок -> [(x, y, предмет), ...]
+sleeping_items = {}
+
+
+def load_chunk(cx, cy):
+    x0, y0, x1, y1 = streamer.cells(cx, cy)
+    for x, y in level_grid.find(levels.ENEMY, x0, y0, x1, y1).tolist():
+        Enemy(x, y)
+    for x, y, icon in sleeping_items.pop((cx, cy), ()):
+        Item("Basic", x, y, icon)
+
+
+def unload_chunk(cx, cy):
+    for enemy in enemies_group.sprites():
+        if streamer.chunk_of(*enemy.pos) == (cx, cy):
+            # клетка остается занятой, при загрузке враг появится там же
+            enemy.kill()
+    for item in basic_item_group.sprites():
+        if streamer.chunk_of(item.rect.x // tile_width, item.rect.y // tile_height) == (cx, cy):
+            sleeping_items.setdefault((cx, cy), []).append((item.rect.x, item.rect.y, item.inventory_icon))
+            item.kill()
+    tile_layer.evict(cx, cy)
+
+
+def drop_item(x, y, icon):
+    # предмет на пол в точку (x, y); в незагруженном куске он сразу засыпает
+    chunk = streamer.chunk_of(x // tile_width, y // tile_height)
+    if chunk in streamer.active:
+        Item("Basic", x, y, icon)
+    else:
+        sleeping_items.setdefault(chunk, []).append((x, y, icon))
+
+
+# решения врагов раскладываются по тикам (scheduler.py); без окна и при записи - с бюджетом по числу решений:
+ai = AiScheduler(max_updates=AI_MAX_UPDATES if HEADLESS or RECORD_PATH else None)
+
+streamer = ChunkStreamer(level_grid.width, level_grid.height, tile_width, load_chunk, unload_chunk)
+streamer.update(camera.view())
+
+# пути врагов к игроку, одни на всех:
+flow_field = FlowField(level_grid)
 
-AnimatedSprite(load_image("m_r.png"), 10, 1, 350, 200, 5)
 running = True
 Storona = 'u'
 
@@ -508,7 +498,7 @@ Status(AM_bar[0] + 40 + bars_border // 2, AM_bar[1] + 10 + bars_border // 2, Non
 realy_mana_line = Status(AM_bar[0] + 40 + bars_border // 2, AM_bar[1] + 10 + bars_border // 2, None, bars_len - bars_border, bars_height - bars_border,  "blue")
 
 # запасной шрифт для текста:
-f1 = pygame.font.Font(None, 36)
+f1 = get_font(None, 36)
 
 # у мыши теперь есть квадратный спрайт 1|1 пикселя:
 mouse_sprite = Sprite_Mouse_Location()
@@ -526,22 +516,61 @@ move_item = None
 move_item_start_pos = [0, 0]
 # за счет этой конструкции функция думает, что move_item - объект класса:
 
-#счётчики игровых событий:
+# что поменялось на экране с прошлого кадра (только для DIRTY_RECTS):
+dirty = DirtyTracker(screen.get_rect())
+last_camera = None
+last_inventory_view = inventory_view
+
+
+def collect_dirty(alpha):
+    global last_camera, last_inventory_view
+    # камера сдвинулась или открыт инвентарь - перерисовываем весь экран:
+    if (camera.x, camera.y) != last_camera or inventory_view or inventory_view != last_inventory_view:
+        dirty.mark_all()
+    last_camera = (camera.x, camera.y)
+    last_inventory_view = inventory_view
+
+    for group in (player_group, enemies_group, basic_item_group):
+        for sprite in group:
+            dirty.track(sprite, camera.apply(sprite.rect))
+    for sprite in animation_group:
+        dirty.track(sprite, camera.apply(sprite.rect), id(sprite.image))
+    for item in item_labels:
+        dirty.track(item.text, item.text.text.get_rect(topleft=(item.text.pos_x + camera.x, item.text.pos_y + camera.y)))
+    if debug_view:
+        for text in debug_texts:
+            dirty.track(text, text.text.get_rect(topleft=(text.pos_x, text.pos_y)), text.string)
+    if hud.changed:
+        dirty.mark(hud.rect)
+    if profiler.visible:
+        # график меняется каждый кадр; когда его выключат, трекер сам сотрет место, где он был
+        dirty.track(profiler, profiler.overlay_rect(), profiler.frame)
+    # пули: где были в прошлом кадре и где будут сейчас
+    dirty.mark_many(bullets.last_rects)
+    bullets.last_rects = bullets.screen_rects(camera.x, camera.y, alpha)
+    dirty.mark_many(bullets.last_rects)
+    return dirty.collect()
+
+
+# надписи с показателями игрока (текст меняется только вместе со значением):
+text1 = Text(100, 10, '', (180, 0, 0))
+text2 = Text(110, 35, '', (180, 0, 0))
+text3 = Text(80, 60, '', (180, 0, 0))
+debug_text = Text(10, HEIGHT - 25, '')
+ai_text = Text(10, HEIGHT - 50, '')
+stream_text = Text(10, HEIGHT - 75, '')
+path_text = Text(10, HEIGHT - 100, '')
+sight_text = Text(10, HEIGHT - 125, '')
+# строки отладки по F2:
+debug_texts = (debug_text, ai_text, stream_text, path_text, sight_text)
+
+#счётчики игровых событий (в тиках логики):
+tick_count = 0
 mana_time = 0
 enemy_bullet_time = 0
 ememy_bullet_reload = 0
 bullet_count = 0
-
-
-def get_anim_file(storona):
-    if storona == "u":
-        player.update_image('m_u.png')
-    elif storona == "d":
-        player.update_image('m_d.png')
-    elif storona == "l":
-        player.update_image('m_l.png')
-    elif storona == "r":
-        player.update_image('m_r.png')
+item_labels = []
 
 
 def update_status_bar(player, bar, type, max_type):
@@ -551,6 +580,27 @@ def update_status_bar(player, bar, type, max_type):
     bar.image.fill(pygame.Color(bar.color))
 
 
+def draw_hud(surf, dx, dy):
+    # обновляем bar:
+    update_status_bar(player, realy_heart_line, player.hp, player.max_hp)
+    update_status_bar(player, realy_shield_line, player.armor, player.max_armor)
+    update_status_bar(player, realy_mana_line, player.mana, player.max_mana)
+    for status in status_list:
+        status.draw(surf, dx, dy)
+
+    text1.set_text(f'{player.hp}/{player.max_hp}')
+    text2.set_text(f'{player.armor}/{player.max_armor}')
+    text3.set_text(f'{player.mana}/{player.max_mana}')
+    text1.draw(surf, dx, dy)
+    text2.draw(surf, dx, dy)
+    text3.draw(surf, dx, dy)
+
+
+# все показатели игрока лежат в одной поверхности, которая перерисовывается только при их изменении:
+hud_rect = pygame.Rect(0, 0, 0, 0).unionall([status.rect for status in status_list])
+hud = Hud((0, 0, hud_rect.right + 10, hud_rect.bottom + 10), draw_hud)
+
+
 def new_inventory(inventory=INVENTORY):
     x, y = WIDTH / 2, HEIGHT / 2
     x2, y2 = INVENTORY_W, INVENTORY_H
@@ -590,9 +640,172 @@ def get_inventory_coords(type, coords, inventory=INVENTORY):
             x += INVENTORY_CELL
 
 
+def enemy_think(enem):
+    # решение врага: в свой срок выстрел, если он на экране, видит игрока и идет залп, и в свой срок шаг к игроку;
+    # возвращает, через сколько тиков подойдет ближайший из сроков - за краем экрана они в AI_FAR_FACTOR раз реже
+    fire_ticks = round(ENEMY_FIRE_TIME * TICK_RATE)
+    move_ticks = round(ENEMY_MOVE_TIME * TICK_RATE)
+    on_screen = camera.view().collidepoint(enem.rect.x, enem.rect.y)
+    if not on_screen:
+        fire_ticks *= AI_FAR_FACTOR
+        move_ticks *= AI_FAR_FACTOR
+
+    if tick_count >= enem.next_shot:
+        enem.next_shot = tick_count + fire_ticks
+        if on_screen and bullet_count > 0 and sight.visible(enem.pos, player.pos):
+            enem.shoot()
+
+    if tick_count >= enem.next_move:
+        enem.next_move = tick_count + move_ticks
+        movement = enem.brain()
+        if movement:
+            move(enem, movement)
+            if streamer.chunk_of(*enem.pos) not in streamer.active:
+                # ушел в выгруженный кусок: засыпает там, клетка в level_grid остается за ним
+                enem.kill()
+    return max(1, min(enem.next_shot, enem.next_move) - tick_count)
+
+
+def simulate_tick():
+    # один тик игровой логики длиной 1 / TICK_RATE секунды
+    global mana_time, enemy_bullet_time, ememy_bullet_reload, bullet_count, item_labels, running, tick_count
+    tick_count += 1
+    # игрок мог уйти к новым кускам карты:
+    streamer.update(camera.view())
+    mana_time += 1
+    enemy_bullet_time += 1
+
+    if mana_time >= MANA_REGEN_TIME * TICK_RATE:
+        mana_time = 0
+        if player.mana < player.max_mana:
+            player.mana += 1
+
+    if enemy_bullet_time >= ENEMY_FIRE_TIME * TICK_RATE:
+        enemy_bullet_time = 0
+        if bullet_count > 0:
+            bullet_count -= 1
+        if ememy_bullet_reload <= 10 and bullet_count <= 0:
+            ememy_bullet_reload += 1
+        if ememy_bullet_reload >= 10 and bullet_count <= 0:
+            ememy_bullet_reload = 0
+            bullet_count = 1 + random.randint(1, 4)
+
+    # поле пересчитывается, только если игрок сменил клетку:
+    flow_field.update(player.pos)
+    ai.run(tick_count, enemy_think)
+    profiler.mark('ai')
+
+    bullets.step()
+    # пули, улетевшие за уровень или в стену:
+    bullets.cull()
+    profiler.mark('bullets')
+
+    # собственно проверка на столкновение:
+    for group, grid in collision_grids.items():
+        grid.build(group)
+    for hit in bullets.collide(collision_grids[enemies_group], PLAYER):
+        hit.kill()
+        level_grid.clear(hit.pos_x, hit.pos_y)
+    if bullets.collide(collision_grids[player_group], ENEMY):
+        if player.armor > 0:
+            player.armor -= 1
+        elif player.hp > 0:
+            player.hp -= 1
+    # предметы под игроком, у которых показываем подсказку:
+    item_labels = list(spatial_collide(collision_grids[basic_item_group], player_group, False, False))
+    profiler.mark('collision')
+
+    animation_group.update()
+    profiler.mark('animation')
+
+    if player.hp == 0:
+        running = False
+
+
+def draw_scene(alpha):
+    # весь кадр целиком; при заданной на screen области отсечения рисуется только она
+    screen.fill(pygame.Color("black"))
+    tile_layer.draw(screen, camera.x, camera.y)
+    profiler.mark('tiles')
+    camera.draw(player_group, screen)
+    camera.draw(enemies_group, screen)
+    mouse_group.draw(screen)
+
+    bullets.draw(screen, camera.x, camera.y, alpha)
+
+    camera.draw(basic_item_group, screen)
+    if inventory_view:
+        for item in inventory_group:
+            item.draw(screen)
+        inventory_item_group.draw(screen)
+    profiler.mark('sprites')
+
+    # отображает все показатели игрока:
+    hud.draw(screen)
+
+    for item in item_labels:
+        item.text.draw(screen, camera.x, camera.y)
+
+    if debug_view:
+        for text in debug_texts:
+            text.draw(screen)
+    profiler.draw(screen)
+    profiler.mark('hud')
+
+    camera.draw(animation_group, screen)
+    profiler.mark('animation')
+
+
+def draw_frame(alpha):
+    camera.update(player)
+    hud.update((player.hp, player.max_hp, player.armor, player.max_armor, player.mana, player.max_mana))
+    if debug_view:
+        debug_text.set_text(f'пули: {len(bullets)} в игре, {bullets.free} свободно, '
+                            f'{bullets.recycled} переиспользовано, {bullets.dropped} не влезло')
+        ai_text.set_text(f'ИИ: {ai.updates} решений за тик, опоздание {ai.lag} тиков')
+        stream_text.set_text(f'куски карты: {len(streamer.active)} загружено, '
+                             f'{streamer.loaded} загрузок, {streamer.unloaded} выгрузок')
+        path_text.set_text(f'поле путей: {flow_field.updates} пересчетов, {flow_field.shifts} поправок')
+        sight_text.set_text(f'видимость: {sight.hits} из кэша, {sight.misses} посчитано')
+
+    dirty_rects = None
+    if DIRTY_RECTS:
+        dirty_rects = collect_dirty(alpha)
+
+    if dirty_rects is None:
+        # камера сдвинулась или изменилось слишком много: весь экран
+        draw_scene(alpha)
+        pygame.display.flip()
+    else:
+        # каждый изменившийся кусок перерисовывается отдельно, все остальное на экране не трогается
+        for rect in dirty_rects:
+            screen.set_clip(rect)
+            draw_scene(alpha)
+        screen.set_clip(None)
+        pygame.display.update(dirty_rects)
+    profiler.mark('flip')
+
+
+# логика идет тиками фиксированной длины, а кадры рисуются с той скоростью, какая получается:
+tick_time = 1 / TICK_RATE
+accumulator = 0
+
+profiler = Profiler(1000 / FPS, csv_path=PROFILE_CSV)
+# без окна сценарий может сам расставить пули/предметы и вернуть функцию, которая вызывается каждый тик
+headless_tick = HEADLESS_SETUP(sys.modules[__name__]) if HEADLESS and HEADLESS_SETUP else None
+loop_start = last_time = time()
+
 while running:
-    tic = time()
-    for event in pygame.event.get():
+    profiler.start_frame()
+    if HEADLESS:
+        # без окна никого не ждем: каждый проход цикла - ровно один тик
+        accumulator = tick_time
+    else:
+        now = time()
+        # после очень долгого кадра не пытаемся догнать все пропущенные тики сразу:
+        accumulator += min(now - last_time, MAX_FRAME_TIME)
+        last_time = now
+    for event in controls.events():
         if event.type == pygame.QUIT:
             running = False
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -601,7 +814,7 @@ while running:
                 player.shoot(Storona)
             else:
                 for my_mouse in mouse_group:
-                    my_mouse.rect.center = pygame.mouse.get_pos()
+                    my_mouse.rect.center = controls.mouse_pos()
                 hits = pygame.sprite.groupcollide(inventory_item_group, mouse_group, False, False)
                 for hit in hits:
                     move_item = hit
@@ -637,25 +850,24 @@ while running:
                 else:
                     # иначе выбрасывает предмет себе под ноги:
                     player.inventory_list[move_item.inventory_pos] = "#"
-                    move_item.pos = (player.pos[0] - player.razn_x) * 50, (player.pos[1] - player.razn_y) * 50
-                    Item("Basic", move_item.pos[0], move_item.pos[1], move_item.inventory_icon)
+                    move_item.pos = player.rect.topleft
+                    drop_item(move_item.pos[0], move_item.pos[1], move_item.inventory_icon)
                     inventory_item_group.remove(move_item)
 
                 move_item.draw(screen)
             move_item = None
 
         if event.type == pygame.MOUSEMOTION:
-            x, y = pygame.mouse.get_pos()
+            x, y = controls.mouse_pos()
 
             # претаскивание предметов в инвентаре:
             if move_item != None:
-                move_item.pos = pygame.mouse.get_pos()
+                move_item.pos = controls.mouse_pos()
                 move_item.pos = move_item.pos[0] - ITEMS[move_item.inventory_icon][1][0], move_item.pos[1] - ITEMS[move_item.inventory_icon][1][
                     1]
                 move_item.draw(screen)
 
             # поворот модельки героя к мыши:
-            x2, y2 = (player.pos[0] - player.razn_x) * 50, (player.pos[1] - player.razn_y) * 50
             if x < player.start_pos[0] * 50 and y < player.start_pos[1] * 50:
                 if x > y:
                     Storona = "u"
@@ -677,32 +889,32 @@ while running:
                 elif x < y:
                     Storona = "d"
 
-            animation_group = pygame.sprite.Group()
-            get_anim_file(Storona)
+            # кадры всех сторон уже нарезаны, меняется только набор:
+            player.animation.turn(Storona)
 
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_w:
                 move(player, "up")
-                animation_group = pygame.sprite.Group()
-                get_anim_file(Storona)
             elif event.key == pygame.K_s:
                 move(player, "down")
-                animation_group = pygame.sprite.Group()
-                get_anim_file(Storona)
             elif event.key == pygame.K_a:
                 move(player, "left")
-                animation_group = pygame.sprite.Group()
-                get_anim_file(Storona)
             elif event.key == pygame.K_d:
                 move(player, "right")
-                animation_group = pygame.sprite.Group()
-                get_anim_file(Storona)
             elif event.key == pygame.K_i:
                 if inventory_view:
                     inventory_view = False
                 else:
                     inventory_view = True
 
+            elif event.key == pygame.K_F2:
+                debug_view = not debug_view
+            elif event.key == pygame.K_F3:
+                # график времени фаз кадра:
+                profiler.toggle(screen.get_rect())
+            elif event.key == pygame.K_F4:
+                profiler.dump_csv('profile.csv')
+
             elif event.key == pygame.K_e:
                 # игрок берет 1 предмет в инвентарь:
                 hits = pygame.sprite.groupcollide(basic_item_group, player_group, False, False)
@@ -717,103 +929,29 @@ while running:
                         Item("inventory", hit.pos[0], hit.pos[1], hit.inventory_icon, hit.inventory_pos)
                         basic_item_group.remove(hit)
                     break
-    if my_time > 0.01:
-        mana_time += 0.01
-        enemy_bullet_time += 0.01
-
-        if mana_time > 0.25:
-            mana_time = 0
-            if player.mana < player.max_mana:
-                player.mana += 1
-
-        # 0.1
-        if enemy_bullet_time > 0.1:
-            enemy_bullet_time = 0
-            if bullet_count > 0:
-                bullet_count -= 1
-            if ememy_bullet_reload <= 10 and bullet_count <= 0:
-                ememy_bullet_reload += 1
-            if ememy_bullet_reload >= 10 and bullet_count <= 0:
-                ememy_bullet_reload = 0
-                bullet_count = 1 + random.randint(1, 4)
-
-            for enem in enemies_group.sprites():
-                if screen.get_rect().collidepoint(enem.rect.x, enem.rect.y):
-                    if bullet_count > 0:
-                        enem.shoot()
-        my_time = 0
-    screen.fill(pygame.Color("black"))
-    camera.update(player)
-    tiles_group.draw(screen)
-    solid_objects.draw(screen)
-    player_group.draw(screen)
-    enemies_group.draw(screen)
-    enemy_bullets.draw(screen)
-    player_bullets.draw(screen)
-    mouse_group.draw(screen)
-
-    for bullet in player_bullets:
-        bullet.draw(screen)
-    for bullet in player_bullets:
-        bullet.update()
-
-    for bullet in enemy_bullets:
-        bullet.draw(screen)
-    for bullet in enemy_bullets:
-        bullet.update()
-
-    basic_item_group.draw(screen)
-    if inventory_view:
-        for item in inventory_group:
-            item.draw(screen)
-        inventory_item_group.draw(screen)
-
-    # отображает все показатели игрока:
-    for status in status_list:
-        status.draw(screen)
-
-    text1 = Text(100, 10, f'{player.hp}/{player.max_hp}', (180, 0, 0))
-    text2 = Text(110, 35, f'{player.armor}/{player.max_armor}', (180, 0, 0))
-    text3 = Text(80, 60, f'{player.mana}/{player.max_mana}', (180, 0, 0))
-
-    text1.draw(screen)
-    text2.draw(screen)
-    text3.draw(screen)
-
-    # обновляем bar:
-    update_status_bar(player, realy_heart_line, player.hp, player.max_hp)
-    update_status_bar(player, realy_shield_line, player.armor, player.max_armor)
-    update_status_bar(player, realy_mana_line, player.mana, player.max_mana)
-
-    # собственно проверка на столкновение, надо вынести в отдельную функцию нрн:
-    for test in collision_list:
-        hits = pygame.sprite.groupcollide(test[0], test[1], test[2], test[3])
-        if test[0] == enemies_group:
-            for hit in hits:
-                pass
-                level_map[hit.pos_y][hit.pos_x] = "."
-        if test[0] == basic_item_group:
-            hit_list = []
-            for hit in hits:
-                hit.text.draw(screen)
-        if test[0] == player_group and test[1] == enemy_bullets:
-            for hit in hits:
-                if player.armor > 0:
-                    player.armor -= 1
-                elif player.hp > 0:
-                    player.hp -= 1
-
-    if player.hp == 0:
-        running = False
-
-    animation_group.draw(screen)
-    animation_group.update()
-    pygame.display.flip()
-    clock.tick(FPS)
-
-    toc = time()
-    my_time += toc - tic
-    next_time += toc - tic
+    profiler.mark('events')
+    # после выхода (в том числе в кадре с QUIT) тиков больше нет - ни в игре, ни в повторе
+    while running and accumulator >= tick_time:
+        accumulator -= tick_time
+        if headless_tick:
+            headless_tick()
+        simulate_tick()
+    # насколько текущий кадр ушел вперед от последнего тика (0..1), для плавной отрисовки пуль:
+    alpha = accumulator / tick_time
+
+    if not HEADLESS or HEADLESS_RENDER:
+        draw_frame(alpha)
+    if HEADLESS:
+        if tick_count >= HEADLESS_TICKS:
+            running = False
+    else:
+        clock.tick(FPS)
+    profiler.mark('wait')
+    profiler.end_frame()
 
+loop_time = time() - loop_start
+profiler.stop_csv()
+if RECORD_PATH and not HEADLESS:
+    replay.save(RECORD_PATH, record_seed, level_name, tick_count, controls.script, replay.state_digest(sys.modules[__name__]))
 pygame.display.quit()
 pygame.quit()
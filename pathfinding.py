@@ -0,0 +1,110 @@
+import numpy as np
+
+from levels import FLOOR
+from settings import FLOW_RADIUS
+
+# соседние клетки, в порядке, в котором их перебирает step():
+NEIGHBOURS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+class FlowField:
+    # общее для всех врагов поле расстояний по полу до цели (игрока), только в окне FLOW_RADIUS клеток
+    # вокруг нее (дальше враги все равно спят, см. streaming.py); враг просто шагает туда, где расстояние меньше.
+    # поле считается волной BFS, а когда цель шагает на соседнюю клетку и не ушла далеко от центра окна,
+    # старое поле только поправляется (см. _shift)
+    def __init__(self, grid, radius=FLOW_RADIUS):
+        self.grid = grid
+        self.radius = radius
+        self.target = None
+        self.centre = None
+        # расстояния с рамкой в одну клетку -1 вокруг окна (соседи крайних клеток без проверок), dist - само окно
+        self.padded = np.full((2, 2), -1, dtype=np.int32)
+        self.dist = self.padded[1:-1, 1:-1]
+        self.x0 = self.y0 = 0
+        # сколько раз поле считалось заново и сколько раз поправлялось (строка отладки по F2 в main.py):
+        self.updates = 0
+        self.shifts = 0
+
+    def update(self, target):
+        target = tuple(target)
+        if target == self.target:
+            return
+        tx, ty = target
+        if (self.target is not None and abs(tx - self.target[0]) + abs(ty - self.target[1]) == 1 and
+                max(abs(tx - self.centre[0]), abs(ty - self.centre[1])) <= self.radius // 4 and
+                self.distance(tx, ty) == 1):
+            self._shift(target)
+        else:
+            self._fill(target, target)
+        self.target = target
+
+    def _fill(self, centre, target):
+        # BFS заново в окне вокруг centre
+        cx, cy = centre
+        tx, ty = target
+        self.centre = centre
+        self.x0, self.y0 = max(cx - self.radius, 0), max(cy - self.radius, 0)
+        x1, y1 = min(cx + self.radius + 1, self.grid.width), min(cy + self.radius + 1, self.grid.height)
+        floor = self.grid.tiles[self.y0:y1, self.x0:x1] == FLOOR
+        dist = np.full(floor.shape, -1, dtype=np.int32)
+        # волна идет сразу всем фронтом: на шаге step фронт - клетки на расстоянии step
+        front = np.zeros(floor.shape, dtype=bool)
+        front[ty - self.y0, tx - self.x0] = True
+        dist[front] = 0
+        step = 0
+        while front.any():
+            step += 1
+            grown = np.zeros_like(front)
+            grown[1:] |= front[:-1]
+            grown[:-1] |= front[1:]
+            grown[:, 1:] |= front[:, :-1]
+            grown[:, :-1] |= front[:, 1:]
+            front = grown & floor & (dist < 0)
+            dist[front] = step
+        self.padded = np.pad(dist, 1, constant_values=-1)
+        self.dist = self.padded[1:-1, 1:-1]
+        self.target = target
+        self.updates += 1
+
+    def _shift(self, target):
+        # цель шагнула на соседнюю клетку B. Клетки сетки красятся в шахматном порядке, и соседние клетки
+        # разного цвета, поэтому до любой достижимой клетки новое расстояние на 1 меньше или на 1 больше.
+        # меньше - ровно у тех, чей кратчайший путь к старой цели шел через B: они находятся от B вверх
+        # по уровням расстояния, клетка уровня k + 1 входит, если рядом есть вошедшая клетка уровня k
+        flat = self.padded.ravel()
+        width = self.padded.shape[1]
+        # клетки, сгруппированные по расстоянию: уровень k - order[bounds[k]:bounds[k + 1]]
+        order = np.argsort(flat)
+        bounds = np.cumsum(np.bincount(flat + 1))
+        around = np.array((-1, 1, -width, width))
+        closer = np.zeros(flat.size, dtype=bool)
+        closer[(target[1] - self.y0 + 1) * width + target[0] - self.x0 + 1] = True
+        for level in range(2, len(bounds) - 1):
+            cells = order[bounds[level]:bounds[level + 1]]
+            cells = cells[closer[cells[:, None] + around].any(axis=1)]
+            if not len(cells):
+                break
+            closer[cells] = True
+        reachable = flat >= 0
+        flat[reachable] += 1
+        flat[closer] -= 2
+        self.shifts += 1
+
+    def distance(self, x, y):
+        # шагов до цели; -1 - не дойти (или клетка за окном)
+        x -= self.x0
+        y -= self.y0
+        if 0 <= y < self.dist.shape[0] and 0 <= x < self.dist.shape[1]:
+            return int(self.dist[y, x])
+        return -1
+
+    def step(self, x, y):
+        # свободная соседняя клетка, откуда до цели ближе всего, или None, если шагать некуда
+        best, here = None, self.distance(x, y)
+        if here <= 0:
+            return None
+        for dx, dy in NEIGHBOURS:
+            d = self.distance(x + dx, y + dy)
+            if 0 <= d < here and self.grid.walkable(x + dx, y + dy):
+                best, here = (x + dx, y + dy), d
+        return best
@@ -0,0 +1,138 @@
+import csv
+from collections import deque
+from time import perf_counter
+
+import pygame
+
+from assets import render_text
+from settings import PROFILE_HISTORY
+
+# фазы кадра в том порядке, в каком они идут, и их цвета на графике
+PHASES = ('events', 'ai', 'bullets', 'collision', 'animation', 'tiles', 'sprites', 'hud', 'flip', 'wait')
+COLORS = {
+    'events': (255, 255, 255),
+    'ai': (255, 80, 80),
+    'bullets': (255, 220, 0),
+    'collision': (255, 140, 0),
+    'animation': (200, 0, 200),
+    'tiles': (0, 160, 0),
+    'sprites': (0, 220, 220),
+    'hud': (80, 80, 255),
+    'flip': (150, 150, 150),
+}
+
+
+class Profiler:
+    # время каждой фазы кадра: mark(фаза) относит к ней все время с прошлой отметки
+    def __init__(self, budget_ms, history=PROFILE_HISTORY, csv_path=None):
+        self.budget_ms = budget_ms
+        self.history = deque(maxlen=history)
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.last = perf_counter()
+        self.frame = 0
+        self.visible = False
+        self.rect = None
+        self.graph = None
+        self.legend = []
+        self.csv_file = None
+        self.csv = None
+        if csv_path:
+            self.start_csv(csv_path)
+
+    def start_frame(self):
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.last = perf_counter()
+
+    def mark(self, phase):
+        now = perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        row = tuple(self.current[phase] * 1000 for phase in PHASES)
+        self.history.append(row)
+        if self.csv:
+            self.csv.writerow((self.frame,) + tuple(f'{ms:.3f}' for ms in row))
+        if self.visible:
+            self._add_column(row)
+        self.frame += 1
+
+    def start_csv(self, path):
+        self.stop_csv()
+        self.csv_file = open(path, 'w', newline='')
+        self.csv = csv.writer(self.csv_file)
+        self.csv.writerow(('frame',) + PHASES)
+
+    def stop_csv(self):
+        if self.csv_file:
+            self.csv_file.close()
+        self.csv_file = None
+        self.csv = None
+
+    # сохранить последние кадры из памяти
+    def dump_csv(self, path):
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame',) + PHASES)
+            first = self.frame - len(self.history)
+            for i, row in enumerate(self.history):
+                writer.writerow((first + i,) + tuple(f'{ms:.3f}' for ms in row))
+
+    def averages(self):
+        if not self.history:
+            return dict.fromkeys(PHASES, 0.0)
+        return {phase: sum(row[i] for row in self.history) / len(self.history) for i, phase in enumerate(PHASES)}
+
+    def toggle(self, screen_rect):
+        self.visible = not self.visible
+        if self.visible:
+            w, h = self.history.maxlen, 120
+            self.rect = pygame.Rect(screen_rect.right - w - 10, screen_rect.bottom - h - 10, w, h)
+            self.graph = pygame.Surface((w, h)).convert()
+            self.graph.fill((0, 0, 0))
+            for row in self.history:
+                self._add_column(row)
+            # подписи нужны уже до первого draw(): по ним считается overlay_rect()
+            self._build_legend()
+
+    def _add_column(self, row):
+        # график едет влево на 1 пиксель, новый кадр дорисовывается справа столбиком
+        w, h = self.graph.get_size()
+        self.graph.scroll(-1, 0)
+        self.graph.fill((0, 0, 0), (w - 1, 0, 1, h))
+        scale = h / (self.budget_ms * 2)
+        y = h
+        for phase, ms in zip(PHASES, row):
+            if phase not in COLORS:
+                continue
+            top = y - ms * scale
+            if y > 0 and y - top >= 0.5:
+                pygame.draw.line(self.graph, COLORS[phase], (w - 1, y - 1), (w - 1, max(int(top), 0)))
+            y = top
+        # линия бюджета кадра (1000 / FPS мс) - ровно посередине
+        self.graph.set_at((w - 1, h // 2), (255, 0, 0))
+
+    def draw(self, surf):
+        if not self.visible:
+            return
+        surf.blit(self.graph, self.rect)
+        # подписи пересчитываем раз в полсекунды, чтобы не плодить надписи каждый кадр:
+        if self.frame % 25 == 0 or not self.legend:
+            self._build_legend()
+        y = self.rect.top - 4
+        for text in reversed(self.legend):
+            y -= text.get_height()
+            surf.blit(text, (self.rect.left, y))
+
+    def _build_legend(self):
+        averages = self.averages()
+        total = sum(ms for phase, ms in averages.items() if phase != 'wait')
+        self.legend = [render_text(f'кадр {total:.1f} / {self.budget_ms:.0f} мс', (255, 255, 255), size=20)]
+        for phase in PHASES:
+            if phase in COLORS:
+                self.legend.append(render_text(f'{phase} {averages[phase]:.2f}', COLORS[phase], size=18))
+
+    def overlay_rect(self):
+        # весь кусок экрана, который занимает график с подписями
+        height = sum(text.get_height() for text in self.legend) + 4
+        return self.rect.union(self.rect.move(0, -height))
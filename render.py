@@ -0,0 +1,74 @@
+import pygame
+
+from settings import DIRTY_MAX_RECTS, DIRTY_MAX_AREAS, DIRTY_MERGE_RATIO
+
+
+class DirtyTracker:
+    # собирает куски экрана, которые изменились с прошлого кадра.
+    # collect() возвращает список прямоугольников или None, если проще перерисовать весь экран
+    def __init__(self, screen_rect, max_rects=DIRTY_MAX_RECTS, max_areas=DIRTY_MAX_AREAS,
+                 merge_ratio=DIRTY_MERGE_RATIO):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.max_rects = max_rects
+        self.max_areas = max_areas
+        self.merge_ratio = merge_ratio
+        self.rects = []
+        self.full = True
+        # key -> (rect, state) с прошлого кадра и с текущего
+        self.prev = {}
+        self.cur = {}
+
+    def mark(self, rect):
+        self.rects.append(pygame.Rect(rect))
+
+    def mark_many(self, rects):
+        self.rects.extend(pygame.Rect(rect) for rect in rects)
+
+    def mark_all(self):
+        self.full = True
+
+    # объект key сейчас нарисован в rect; state - то, от чего зависит его картинка
+    def track(self, key, rect, state=None):
+        self.cur[key] = (pygame.Rect(rect), state)
+
+    def collect(self):
+        for key, (rect, state) in self.cur.items():
+            old = self.prev.get(key)
+            if old is None:
+                self.rects.append(rect)
+            elif old[0] != rect or old[1] != state:
+                self.rects.append(rect)
+                self.rects.append(old[0])
+        for key, (rect, state) in self.prev.items():
+            if key not in self.cur:
+                self.rects.append(rect)
+        self.prev, self.cur = self.cur, {}
+
+        rects = [rect.clip(self.screen_rect) for rect in self.rects]
+        rects = [rect for rect in rects if rect.w and rect.h]
+        full = self.full or len(rects) > self.max_rects
+        self.rects = []
+        self.full = False
+        if full:
+            return None
+        # каждый кусок перерисовывается целым кадром с отсечением, поэтому близкие куски
+        # объединяются, а если и после этого их много - дешевле весь экран
+        areas = merge_rects(rects, self.merge_ratio)
+        return None if len(areas) > self.max_areas else areas
+
+
+def merge_rects(rects, ratio):
+    # жадно сливает прямоугольники: кусок присоединяется к группе, если их общий охват
+    # не больше ratio * (сумма площадей); возвращает охваты групп
+    groups = []
+    for rect in sorted(rects, key=lambda rect: (rect.y, rect.x)):
+        area = rect.w * rect.h
+        for group in groups:
+            union = group[0].union(rect)
+            if union.w * union.h <= ratio * (group[1] + area):
+                group[0] = union
+                group[1] += area
+                break
+        else:
+            groups.append([rect, area])
+    return [group[0] for group in groups]
@@ -0,0 +1,118 @@
+# запись и повтор игры: seed, карта и ввод по тикам - повтор без окна дает ту же игру бит в бит
+#   python replay.py record bug.rec       - играть как обычно, при выходе запись сохранится
+#   python replay.py play bug.rec         - повторить без окна и сверить итоговое состояние
+#   python replay.py play bug.rec --profile-csv phases.csv  - как нагрузка для профилировщика
+#   python replay.py check                - проверка на регрессии: повторить все записи из benchmarks/replays
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import settings
+
+VERSION = 1
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REPLAYS = os.path.join(ROOT, 'benchmarks', 'replays')
+
+
+def state_digest(game):
+    # отпечаток всего, что меняет логика: если повтор разошелся с записью, он тоже разойдется
+    digest = hashlib.sha1()
+    player = game.player
+    digest.update(repr((game.tick_count, player.pos, player.hp, player.armor, player.mana,
+                        player.inventory_list)).encode())
+    digest.update(repr(sorted(enemy.rect.topleft for enemy in game.enemies_group)).encode())
+    digest.update(game.level_grid.occupancy.tobytes())
+    digest.update(repr(sorted(item.rect.topleft for item in game.basic_item_group)).encode())
+    count = len(game.bullets)
+    digest.update(game.bullets.pos[:count].tobytes())
+    digest.update(game.bullets.owner[:count].tobytes())
+    return digest.hexdigest()
+
+
+def save(path, seed, level, ticks, script, digest):
+    data = {'version': VERSION, 'seed': seed, 'level': level, 'ticks': ticks,
+            'script': script, 'digest': digest}
+    with gzip.open(path, 'wt') as file:
+        json.dump(data, file, separators=(',', ':'))
+
+
+def load(path):
+    with gzip.open(path, 'rt') as file:
+        data = json.load(file)
+    if data.get('version') != VERSION:
+        raise ValueError(f'{path}: неизвестная версия записи {data.get("version")}')
+    return data
+
+
+def record(path, seed=None):
+    if 'main' in sys.modules:
+        raise RuntimeError('игра уже прогонялась в этом процессе, запустите новый процесс')
+    settings.RECORD_PATH = path
+    settings.RECORD_SEED = seed
+    # main.py - это сама игра: импорт идет до выхода из нее
+    import main
+    return main
+
+
+def play(path, render=False, profile_csv=None):
+    import headless
+    data = load(path)
+    game = headless.run(data['level'], data['ticks'], data['script'], data['seed'], render, profile_csv)
+    return game, data['digest'], state_digest(game)
+
+
+def check(paths=()):
+    # каждая запись повторяется в своем процессе (игра прогоняется один раз на процесс);
+    # возвращает записи, которые разошлись или упали
+    paths = [os.path.abspath(path) for path in paths] or sorted(glob.glob(os.path.join(REPLAYS, '*.rec')))
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    failed = []
+    for path in paths:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), 'play', path],
+                             cwd=ROOT, env=env, capture_output=True, text=True)
+        name = os.path.relpath(path, ROOT) if path.startswith(ROOT + os.sep) else path
+        print(f'{name}: {"ok" if out.returncode == 0 else "ОШИБКА"}')
+        if out.returncode != 0:
+            print(out.stdout + out.stderr)
+            failed.append(path)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Запись и повтор игры')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='играть и записывать')
+    record_parser.add_argument('path')
+    record_parser.add_argument('--seed', type=int, help='по умолчанию случайный')
+    play_parser = commands.add_parser('play', help='повторить без окна и сверить с записью')
+    play_parser.add_argument('path')
+    play_parser.add_argument('--render', action='store_true', help='рисовать кадры (медленнее)')
+    play_parser.add_argument('--profile-csv', help='записать время фаз каждого тика в CSV')
+    check_parser = commands.add_parser('check', help='повторить записи и сверить все (по умолчанию benchmarks/replays)')
+    check_parser.add_argument('paths', nargs='*')
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        failed = check(args.paths)
+        if failed:
+            sys.exit(1)
+        return
+    if args.command == 'record':
+        game = record(args.path, args.seed)
+        print(f'записано {game.tick_count} тиков в {args.path}')
+        return
+    game, expected, actual = play(args.path, args.render, args.profile_csv)
+    print(f'тиков: {game.tick_count} за {game.loop_time:.2f} с')
+    if expected != actual:
+        print(f'повтор разошелся с записью: {actual} вместо {expected}')
+        sys.exit(1)
+    print('повтор совпал с записью')
+
+
+if __name__ == '__main__':
+    main()
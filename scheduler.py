@@ -0,0 +1,45 @@
+import heapq
+from time import perf_counter
+
+from settings import AI_BUDGET_MS
+
+
+class AiScheduler:
+    # у каждого врага свой тик, когда ему снова "думать"; за тик обрабатываются те, чей срок подошел,
+    # пока не кончится бюджет: budget_ms миллисекунд или, если задано, max_updates штук (так результат
+    # не зависит от скорости машины - нужно для повторов). кто не успел, идет первым в следующем тике
+    def __init__(self, budget_ms=AI_BUDGET_MS, max_updates=None):
+        self.budget_ms = budget_ms
+        self.max_updates = max_updates
+        self.queue = []
+        self.tick = 0
+        # номер для порядка в куче при равных сроках (спрайты между собой не сравниваются):
+        self.order = 0
+        # для отладки: сколько решений было в последнем тике и на сколько тиков после него
+        # опаздывает самое старое из не успевших:
+        self.updates = 0
+        self.lag = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, sprite, delay=0):
+        heapq.heappush(self.queue, (self.tick + delay, self.order, sprite))
+        self.order += 1
+
+    def run(self, tick, think):
+        # think(спрайт) делает работу и возвращает, через сколько тиков вызвать его снова;
+        # мертвые (kill()) спрайты выпадают из очереди сами
+        self.tick = tick
+        start = perf_counter()
+        self.updates = 0
+        while self.queue and self.queue[0][0] <= tick:
+            if self.updates and (self.updates >= self.max_updates if self.max_updates is not None
+                                 else (perf_counter() - start) * 1000 >= self.budget_ms):
+                break
+            sprite = heapq.heappop(self.queue)[2]
+            if not sprite.alive():
+                continue
+            self.add(sprite, think(sprite))
+            self.updates += 1
+        self.lag = tick - self.queue[0][0] if self.queue and self.queue[0][0] <= tick else 0
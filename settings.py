@@ -1,7 +1,35 @@
 import pygame
 
 size = WIDTH, HEIGHT = (800, 800)
+# сколько кадров в секунду рисуем (не больше):
 FPS = 50
+# сколько тиков игровой логики в секунду, от FPS не зависит:
+TICK_RATE = 100
+# дольше этого один кадр логика не догоняет (секунды):
+MAX_FRAME_TIME = 0.25
+
+# раз во сколько секунд восстанавливается 1 маны:
+MANA_REGEN_TIME = 0.5
+# раз во сколько секунд враги решают, стрелять ли:
+ENEMY_FIRE_TIME = 0.2
+# раз во сколько секунд враги делают шаг к игроку:
+ENEMY_MOVE_TIME = 0.5
+# ближе этого (в шагах по полу) враги к игроку не подходят:
+ENEMY_STOP_DISTANCE = 3
+# окно, в котором враги ищут путь к игроку: столько клеток во все стороны от центра окна;
+# окно сдвигается, когда игрок уходит от центра дальше чем на четверть этого (pathfinding.py)
+FLOW_RADIUS = 40
+# сколько миллисекунд за тик можно тратить на решения врагов (scheduler.py):
+AI_BUDGET_MS = 2
+# без окна и при записи бюджет - число решений за тик, чтобы повтор не зависел от скорости машины:
+AI_MAX_UPDATES = 50
+# враги за краем экрана думают во столько раз реже:
+AI_FAR_FACTOR = 4
+# скорость пуль, пикселей в секунду:
+PLAYER_BULLET_SPEED = 350
+ENEMY_BULLET_SPEED = 250
+# сколько тиков держится один кадр анимации:
+ANIMATION_TICKS = 10
 
 bars_len = 200
 bars_height = 20
@@ -38,3 +66,61 @@ INVENTORY_H = 3
 
 Basic_item_text_x = 0
 Basic_item_text_y = -20
+
+# сколько разных картинок и нарезок держит кэш (assets.py):
+IMAGE_CACHE_SIZE = 64
+# сколько потоков разбирают картинки из data/manifest.txt при запуске:
+ASSET_WORKERS = 4
+# брать картинки из атласа (atlas.py) вместо отдельных файлов:
+USE_ATLAS = True
+# сторона страницы атласа в пикселях:
+ATLAS_SIZE = 1024
+
+# куда в data/ складываются скомпилированные уровни (levels.py):
+LEVEL_CACHE_DIR = "cache"
+
+# размер куска заранее отрисованной земли в клетках (tilemap.py):
+CHUNK_SIZE = 8
+# куски карты вокруг экрана, которые загружены (враги, предметы, земля), в кусках (streaming.py):
+STREAM_MARGIN = 2
+# а дальше этого от экрана куски выгружаются (больше STREAM_MARGIN, чтобы не дергать их на границе):
+STREAM_KEEP = 3
+
+# сколько пуль одновременно может быть на уровне (bullets.py):
+MAX_BULLETS = 4096
+
+# сколько готовых надписей держит кэш (assets.py):
+TEXT_CACHE_SIZE = 256
+
+# перерисовывать только изменившиеся куски экрана вместо flip() (render.py):
+DIRTY_RECTS = False
+# если изменившихся кусков больше, перерисовывается весь экран:
+DIRTY_MAX_RECTS = 64
+# близкие куски сливаются, если охват не больше стольких их суммарных площадей;
+# если после слияния кусков больше DIRTY_MAX_AREAS, тоже перерисовывается весь экран:
+DIRTY_MERGE_RATIO = 2
+DIRTY_MAX_AREAS = 8
+
+# сколько ответов "видит ли враг игрока" помнить (collision.LineOfSight):
+LOS_CACHE_SIZE = 65536
+
+# запуск без окна и без игрока (см. headless.py):
+HEADLESS = False
+HEADLESS_LEVEL = "map.map"
+HEADLESS_TICKS = 1000
+# сценарий ввода для controls.ScriptedInput:
+HEADLESS_SCRIPT = []
+# рисовать ли кадры без окна (медленнее, но можно снимать скриншоты):
+HEADLESS_RENDER = False
+# setup(модуль игры) перед первым тиком, может вернуть функцию для каждого тика (benchmarks/):
+HEADLESS_SETUP = None
+
+# профилировщик: сколько последних кадров помнить (и ширина графика в пикселях):
+PROFILE_HISTORY = 240
+# писать время фаз каждого кадра в этот CSV (None - не писать):
+PROFILE_CSV = None
+
+# записывать игру для повтора в этот файл (см. replay.py, None - не писать):
+RECORD_PATH = None
+# seed для записи (None - случайный):
+RECORD_SEED = None
@@ -0,0 +1,57 @@
+from settings import CHUNK_SIZE, STREAM_MARGIN, STREAM_KEEP
+
+
+class ChunkStreamer:
+    # большая карта живет кусками CHUNK_SIZE x CHUNK_SIZE клеток (те же, что у TileLayer):
+    # кусок загружается, когда камера подходит ближе STREAM_MARGIN кусков от края экрана,
+    # и выгружается, когда она уходит дальше STREAM_KEEP; что значит "загрузить" - решают load/unload
+    def __init__(self, width, height, tile_size, load, unload, chunk_size=CHUNK_SIZE,
+                 margin=STREAM_MARGIN, keep=STREAM_KEEP):
+        self.chunk_size = chunk_size
+        self.chunk_px = tile_size * chunk_size
+        self.chunks_x = (width + chunk_size - 1) // chunk_size
+        self.chunks_y = (height + chunk_size - 1) // chunk_size
+        self.load = load
+        self.unload = unload
+        self.margin = margin
+        self.keep = keep
+        self.active = set()
+        self.last_range = None
+        # сколько раз куски загружались и выгружались (строка отладки по F2 в main.py):
+        self.loaded = 0
+        self.unloaded = 0
+
+    def chunk_range(self, view, margin):
+        # (x0, y0, x1, y1) включительно: куски, которые задевает view, расширенный на margin кусков
+        return (max(view.left // self.chunk_px - margin, 0),
+                max(view.top // self.chunk_px - margin, 0),
+                min((view.right - 1) // self.chunk_px + margin, self.chunks_x - 1),
+                min((view.bottom - 1) // self.chunk_px + margin, self.chunks_y - 1))
+
+    def cells(self, cx, cy):
+        # клетки куска: (x0, y0, x1, y1), правая и нижняя границы не включаются
+        return (cx * self.chunk_size, cy * self.chunk_size,
+                (cx + 1) * self.chunk_size, (cy + 1) * self.chunk_size)
+
+    def chunk_of(self, x, y):
+        return x // self.chunk_size, y // self.chunk_size
+
+    def update(self, view):
+        # view - видимая часть мира; пока камера в тех же кусках, делать нечего
+        near = self.chunk_range(view, self.margin)
+        if near == self.last_range:
+            return
+        self.last_range = near
+        x0, y0, x1, y1 = self.chunk_range(view, self.keep)
+        for chunk in sorted(self.active):
+            if not (x0 <= chunk[0] <= x1 and y0 <= chunk[1] <= y1):
+                self.active.remove(chunk)
+                self.unload(*chunk)
+                self.unloaded += 1
+        x0, y0, x1, y1 = near
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                if (cx, cy) not in self.active:
+                    self.active.add((cx, cy))
+                    self.load(cx, cy)
+                    self.loaded += 1
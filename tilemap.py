@@ -0,0 +1,58 @@
+import pygame
+
+from settings import CHUNK_SIZE
+
+
+class TileLayer:
+    # статичная земля уровня (двумерный массив кодов клеток), заранее отрисованная кусками CHUNK_SIZE x CHUNK_SIZE клеток
+    def __init__(self, level, images, tile_size, chunk_size=CHUNK_SIZE):
+        self.level = level
+        # код клетки (levels.py) -> картинка, клетки без картинки остаются черными:
+        self.images = images
+        self.tile_size = tile_size
+        self.chunk_size = chunk_size
+        self.chunk_px = tile_size * chunk_size
+        self.height, self.width = level.shape
+        self.chunks_x = (self.width + chunk_size - 1) // chunk_size
+        self.chunks_y = (self.height + chunk_size - 1) // chunk_size
+        self.chunks = {}
+
+    def bake_chunk(self, cx, cy):
+        surface = pygame.Surface((self.chunk_px, self.chunk_px)).convert()
+        surface.fill(pygame.Color("black"))
+        # кусок сетки списком, чтобы не доставать клетки из numpy по одной:
+        cells = self.level[cy * self.chunk_size:(cy + 1) * self.chunk_size,
+                           cx * self.chunk_size:(cx + 1) * self.chunk_size].tolist()
+        for y, row in enumerate(cells):
+            for x, cell in enumerate(row):
+                image = self.images.get(cell)
+                if image is not None:
+                    surface.blit(image, (x * self.tile_size, y * self.tile_size))
+        self.chunks[(cx, cy)] = surface
+        return surface
+
+    def get_chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self.bake_chunk(cx, cy)
+        return chunk
+
+    def evict(self, cx, cy):
+        # готовая картинка куска больше не нужна (камера далеко), при возвращении отрисуется заново
+        self.chunks.pop((cx, cy), None)
+
+    def visible_chunks(self, view):
+        # view - прямоугольник экрана в координатах мира
+        x0 = max(view.left // self.chunk_px, 0)
+        y0 = max(view.top // self.chunk_px, 0)
+        x1 = min((view.right - 1) // self.chunk_px, self.chunks_x - 1)
+        y1 = min((view.bottom - 1) // self.chunk_px, self.chunks_y - 1)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                yield cx, cy
+
+    def draw(self, surf, offset_x=0, offset_y=0):
+        # offset - на сколько сдвинут мир относительно экрана
+        view = surf.get_rect().move(-offset_x, -offset_y)
+        for cx, cy in self.visible_chunks(view):
+            surf.blit(self.get_chunk(cx, cy), (cx * self.chunk_px + offset_x, cy * self.chunk_px + offset_y))